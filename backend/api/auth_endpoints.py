@@ -1,12 +1,12 @@
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import text
 from datetime import timedelta
 
 from services.auth_service import get_password_hash, verify_password, create_access_token
 from core.config import DATABASE_URL, JWT_EXPIRE_MINUTES
+from core.database import get_db
 
 logger = logging.getLogger(__name__)
 
@@ -28,25 +28,9 @@ class Token(BaseModel):
     token_type: str
 
 # --- Database Connection ---
-# Use PostgreSQL for Railway, SQLite for local development
+# Shared engine/sessions from core.database: PostgreSQL on Railway, SQLite for local development
 database_url = DATABASE_URL or "sqlite:///./ad_dash.db"
 
-if database_url.startswith("postgres"):
-    # PostgreSQL for Railway
-    engine = create_engine(database_url)
-else:
-    # SQLite for local development
-    engine = create_engine(database_url)
-
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # --- Endpoints ---
 @router.post("/signup", status_code=status.HTTP_201_CREATED)
 def create_user(user: UserCreate, db = Depends(get_db)):
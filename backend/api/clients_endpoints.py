@@ -2,13 +2,15 @@ import logging
 from datetime import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException
+import aiohttp
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, Field
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.engine import make_url
 
 from core.config import DATABASE_URL
+from core.database import async_engine, engine
+from services import facebook_service, lead_definitions, overview_service, time_insights
 
 router = APIRouter()
 
@@ -16,29 +18,6 @@ if not DATABASE_URL:
     logging.error("DATABASE_URL is not configured!")
     raise RuntimeError("DATABASE_URL is not configured. Cannot initialize clients endpoints.")
 
-logging.info(f"Initializing clients engine with DATABASE_URL: {DATABASE_URL}")
-
-connect_args = {}
-try:
-    url_obj = make_url(DATABASE_URL)
-    if url_obj.drivername.startswith("postgres") and "sslmode" not in url_obj.query:
-        connect_args["sslmode"] = "require"
-        logging.info("Added sslmode=require to connect_args")
-except Exception as e:
-    logging.warning(f"Could not parse DATABASE_URL: {e}")
-    pass
-
-try:
-    engine = create_engine(
-        DATABASE_URL,
-        pool_pre_ping=True,
-        connect_args=connect_args if connect_args else {},
-    )
-    logging.info("SQLAlchemy engine created successfully")
-except Exception as e:
-    logging.error(f"Failed to create engine: {e}")
-    raise
-
 
 class ClientCreate(BaseModel):
     account_id: str
@@ -47,6 +26,7 @@ class ClientCreate(BaseModel):
     monthly_budget: float
     start_date: str
     monthly_payment_azn: float
+    lead_action_types: Optional[List[str]] = None
 
 
 class ClientUpdate(BaseModel):
@@ -55,6 +35,7 @@ class ClientUpdate(BaseModel):
     monthly_budget: Optional[float] = None
     start_date: Optional[str] = None
     monthly_payment_azn: Optional[float] = None
+    lead_action_types: Optional[List[str]] = None
 
 
 class ClientResponse(BaseModel):
@@ -65,6 +46,7 @@ class ClientResponse(BaseModel):
     monthly_budget: float
     start_date: str
     monthly_payment_azn: float
+    lead_action_types: List[str] = []
     total_paid: float = 0.0
     last_payment_at: Optional[str] = None
     created_at: str
@@ -103,6 +85,7 @@ def serialize_client_row(row):
         "monthly_budget": float(mapping["monthly_budget"] or 0.0),
         "start_date": str(mapping["start_date"]),
         "monthly_payment_azn": float(mapping["monthly_payment_azn"] or 0.0),
+        "lead_action_types": [t for t in (mapping.get("lead_action_types") or "").split(",") if t],
         "total_paid": float(mapping.get("total_paid") or 0.0),
         "last_payment_at": str(mapping["last_payment_at"]) if mapping.get("last_payment_at") else None,
         "created_at": str(mapping["created_at"]),
@@ -124,82 +107,55 @@ def serialize_payment_row(row):
         "created_at": str(mapping["created_at"]),
     }
 
-def init_clients_table():
-    """Ensure clients table exists (PostgreSQL)."""
-    create_table_sql = """
-        CREATE TABLE IF NOT EXISTS clients (
-            id SERIAL PRIMARY KEY,
-            account_id TEXT UNIQUE NOT NULL,
-            account_name TEXT NOT NULL,
-            avatar_url TEXT,
-            monthly_budget NUMERIC(18,2) NOT NULL DEFAULT 0,
-            start_date DATE NOT NULL,
-            monthly_payment_azn NUMERIC(18,2) NOT NULL DEFAULT 0,
-            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
-            updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
-        );
-    """
-    create_index_sql = "CREATE INDEX IF NOT EXISTS idx_clients_account_id ON clients(account_id);"
-    trigger_fn_sql = """
-        CREATE OR REPLACE FUNCTION set_clients_updated_at()
-        RETURNS TRIGGER AS $$
-        BEGIN
-            NEW.updated_at = NOW();
-            RETURN NEW;
-        END;
-        $$ LANGUAGE plpgsql;
-    """
-    trigger_sql = """
-        DROP TRIGGER IF EXISTS trg_clients_updated_at ON clients;
-        CREATE TRIGGER trg_clients_updated_at
-        BEFORE UPDATE ON clients
-        FOR EACH ROW
-        EXECUTE FUNCTION set_clients_updated_at();
-    """
-    with engine.begin() as conn:
-        conn.execute(text(create_table_sql))
-        conn.execute(text(create_index_sql))
-        conn.execute(text(trigger_fn_sql))
-        conn.execute(text(trigger_sql))
-
-
-# Initialize table only if engine is ready
-try:
-    init_clients_table()
-    logging.info("Clients table initialized successfully")
-except Exception as e:
-    logging.error(f"Failed to initialize clients table: {e}", exc_info=True)
-    # Don't crash the whole app - table might already exist or DB not available
-
-def init_client_payments_table():
-    sql = """
-        CREATE TABLE IF NOT EXISTS client_payments (
-            id SERIAL PRIMARY KEY,
-            client_id INTEGER REFERENCES clients(id) ON DELETE CASCADE,
-            paid_at DATE NOT NULL,
-            amount NUMERIC(18,2) NOT NULL,
-            note TEXT,
-            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-        );
-    """
-    index_sql = "CREATE INDEX IF NOT EXISTS idx_client_payments_client_id ON client_payments(client_id);"
+# total_paid / last_payment_at per client, maintained by the payment write paths below
+# (same transaction as the payment change) instead of a GROUP BY over all payments per request.
+PAYMENT_TOTALS_DELTA_SQL = text("""
+    INSERT INTO client_payment_totals (client_id, total_paid, last_payment_at)
+    VALUES (:client_id, :delta, (SELECT MAX(paid_at) FROM client_payments WHERE client_id = :client_id))
+    ON CONFLICT (client_id) DO UPDATE
+    SET total_paid = client_payment_totals.total_paid + EXCLUDED.total_paid,
+        last_payment_at = EXCLUDED.last_payment_at,
+        updated_at = CURRENT_TIMESTAMP
+""")
+
+async def apply_payment_delta(conn, client_id: int, delta: float):
+    """Shift a client's total_paid by `delta` and refresh last_payment_at; call inside the payment's transaction."""
+    await conn.execute(PAYMENT_TOTALS_DELTA_SQL, {"client_id": client_id, "delta": delta})
+
+def rebuild_payment_totals() -> int:
+    """Recompute client_payment_totals from client_payments. Returns the number of clients with payments."""
     with engine.begin() as conn:
-        conn.execute(text(sql))
-        conn.execute(text(index_sql))
+        conn.execute(text("DELETE FROM client_payment_totals"))
+        result = conn.execute(text("""
+            INSERT INTO client_payment_totals (client_id, total_paid, last_payment_at)
+            SELECT client_id, SUM(amount), MAX(paid_at)
+            FROM client_payments
+            WHERE client_id IS NOT NULL
+            GROUP BY client_id
+        """))
+    logging.info(f"Rebuilt payment totals for {result.rowcount} clients")
+    return result.rowcount
+
+def parse_iso_date(value: str):
+    # asyncpg принимает для DATE только date, не строку
+    try:
+        return datetime.fromisoformat(value).date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
 
-try:
-    init_client_payments_table()
-    logging.info("client_payments table ready")
-except Exception as e:
-    logging.error(f"Failed to initialize client_payments table: {e}", exc_info=True)
+def apply_lead_definition(account_id: str, definition: Optional[str]):
+    """New lead definition takes effect immediately: drop cached metrics computed with the old one."""
+    lead_definitions.set_account_definition(account_id, definition)
+    facebook_service.adsets_cache.invalidate()
+    time_insights.time_insights_cache.invalidate()
 
-def get_client_row_by_account(account_id: str):
+async def get_client_row_by_account(account_id: str):
     query = text("SELECT * FROM clients WHERE account_id = :account_id")
-    with engine.connect() as conn:
-        row = conn.execute(query, {"account_id": account_id}).mappings().first()
+    async with async_engine.connect() as conn:
+        row = (await conn.execute(query, {"account_id": account_id})).mappings().first()
         return row
 
-def get_payment_row(payment_id: int, client_id: Optional[int] = None):
+async def get_payment_row(payment_id: int, client_id: Optional[int] = None):
     query = text("""
         SELECT * FROM client_payments
         WHERE id = :payment_id
@@ -208,8 +164,8 @@ def get_payment_row(payment_id: int, client_id: Optional[int] = None):
     params = {"payment_id": payment_id}
     if client_id is not None:
         params["client_id"] = client_id
-    with engine.connect() as conn:
-        row = conn.execute(query, params).mappings().first()
+    async with async_engine.connect() as conn:
+        row = (await conn.execute(query, params)).mappings().first()
         return row
 
 @router.get("/clients")
@@ -225,23 +181,18 @@ async def get_all_clients():
                    COALESCE(c.monthly_budget, 0) as monthly_budget,
                    c.start_date,
                    COALESCE(c.monthly_payment_azn, 0) as monthly_payment_azn,
+                   c.lead_action_types,
                    c.created_at,
                    c.updated_at,
                    COALESCE(pay.total_paid, 0) AS total_paid,
                    pay.last_payment_at
             FROM clients c
-            LEFT JOIN (
-                SELECT client_id,
-                       SUM(amount) AS total_paid,
-                       MAX(paid_at) AS last_payment_at
-                FROM client_payments
-                GROUP BY client_id
-            ) pay ON pay.client_id = c.id
+            LEFT JOIN client_payment_totals pay ON pay.client_id = c.id
             ORDER BY c.account_name
         """)
         
-        with engine.connect() as conn:
-            result = conn.execute(query)
+        async with async_engine.connect() as conn:
+            result = await conn.execute(query)
             rows = result.fetchall()
             logging.info(f"Fetched {len(rows)} rows from database")
             clients = [serialize_client_row(row) for row in rows]
@@ -263,18 +214,12 @@ async def get_client(account_id: str):
                COALESCE(pay.total_paid, 0) AS total_paid,
                pay.last_payment_at
         FROM clients c
-        LEFT JOIN (
-            SELECT client_id,
-                   SUM(amount) AS total_paid,
-                   MAX(paid_at) AS last_payment_at
-            FROM client_payments
-            GROUP BY client_id
-        ) pay ON pay.client_id = c.id
+        LEFT JOIN client_payment_totals pay ON pay.client_id = c.id
         WHERE c.account_id = :account_id
     """)
     try:
-        with engine.connect() as conn:
-            row = conn.execute(query, {"account_id": account_id}).mappings().first()
+        async with async_engine.connect() as conn:
+            row = (await conn.execute(query, {"account_id": account_id})).mappings().first()
             if not row:
                 raise HTTPException(status_code=404, detail="Client not found")
             return serialize_client_row(row)
@@ -288,8 +233,8 @@ async def get_client(account_id: str):
 async def create_client(client: ClientCreate):
     """Create a new client"""
     insert_sql = text("""
-        INSERT INTO clients (account_id, account_name, avatar_url, monthly_budget, start_date, monthly_payment_azn)
-        VALUES (:account_id, :account_name, :avatar_url, :monthly_budget, :start_date, :monthly_payment_azn)
+        INSERT INTO clients (account_id, account_name, avatar_url, monthly_budget, start_date, monthly_payment_azn, lead_action_types)
+        VALUES (:account_id, :account_name, :avatar_url, :monthly_budget, :start_date, :monthly_payment_azn, :lead_action_types)
         RETURNING id,
                   account_id,
                   account_name,
@@ -297,6 +242,7 @@ async def create_client(client: ClientCreate):
                   COALESCE(monthly_budget, 0) AS monthly_budget,
                   start_date,
                   COALESCE(monthly_payment_azn, 0) AS monthly_payment_azn,
+                  lead_action_types,
                   created_at,
                   updated_at
     """)
@@ -305,13 +251,17 @@ async def create_client(client: ClientCreate):
         "account_name": client.account_name,
         "avatar_url": client.avatar_url,
         "monthly_budget": client.monthly_budget,
-        "start_date": client.start_date,
+        "start_date": parse_iso_date(client.start_date),
         "monthly_payment_azn": client.monthly_payment_azn,
+        "lead_action_types": lead_definitions.parse_definition(client.lead_action_types) or None,
     }
     try:
-        with engine.begin() as conn:
-            row = conn.execute(insert_sql, params).mappings().first()
-            return serialize_client_row(row)
+        async with async_engine.begin() as conn:
+            row = (await conn.execute(insert_sql, params)).mappings().first()
+        if params["lead_action_types"]:
+            apply_lead_definition(client.account_id, params["lead_action_types"])
+        overview_service.overview_cache.invalidate()
+        return serialize_client_row(row)
     except SQLAlchemyError as e:
         msg = str(e.__cause__ or e)
         if "unique" in msg.lower():
@@ -335,10 +285,14 @@ async def update_client(account_id: str, client_update: ClientUpdate):
         params["monthly_budget"] = client_update.monthly_budget
     if client_update.start_date is not None:
         updates.append("start_date = :start_date")
-        params["start_date"] = client_update.start_date
+        params["start_date"] = parse_iso_date(client_update.start_date)
     if client_update.monthly_payment_azn is not None:
         updates.append("monthly_payment_azn = :monthly_payment_azn")
         params["monthly_payment_azn"] = client_update.monthly_payment_azn
+    if client_update.lead_action_types is not None:
+        # пустой список — вернуть определение по умолчанию
+        updates.append("lead_action_types = :lead_action_types")
+        params["lead_action_types"] = lead_definitions.parse_definition(client_update.lead_action_types) or None
 
     if not updates:
         raise HTTPException(status_code=400, detail="No fields to update")
@@ -354,15 +308,19 @@ async def update_client(account_id: str, client_update: ClientUpdate):
                   COALESCE(monthly_budget, 0) AS monthly_budget,
                   start_date,
                   COALESCE(monthly_payment_azn, 0) AS monthly_payment_azn,
+                  lead_action_types,
                   created_at,
                   updated_at
     """)
     try:
-        with engine.begin() as conn:
-            row = conn.execute(update_sql, params).mappings().first()
+        async with async_engine.begin() as conn:
+            row = (await conn.execute(update_sql, params)).mappings().first()
             if not row:
                 raise HTTPException(status_code=404, detail="Client not found")
-            return serialize_client_row(row)
+        if "lead_action_types" in params:
+            apply_lead_definition(account_id, params["lead_action_types"])
+        overview_service.overview_cache.invalidate()
+        return serialize_client_row(row)
     except HTTPException:
         raise
     except SQLAlchemyError as e:
@@ -374,11 +332,13 @@ async def delete_client(account_id: str):
     """Delete a client"""
     delete_sql = text("DELETE FROM clients WHERE account_id = :account_id")
     try:
-        with engine.begin() as conn:
-            result = conn.execute(delete_sql, {"account_id": account_id})
+        async with async_engine.begin() as conn:
+            result = await conn.execute(delete_sql, {"account_id": account_id})
             if result.rowcount == 0:
                 raise HTTPException(status_code=404, detail="Client not found")
-            return {"message": "Client deleted successfully"}
+        apply_lead_definition(account_id, None)
+        overview_service.overview_cache.invalidate()
+        return {"message": "Client deleted successfully"}
     except HTTPException:
         raise
     except SQLAlchemyError as e:
@@ -386,42 +346,29 @@ async def delete_client(account_id: str):
         raise HTTPException(status_code=500, detail="Failed to delete client")
 
 @router.get("/clients/from-accounts/list")
-async def get_clients_from_accounts():
+async def get_clients_from_accounts(session: aiohttp.ClientSession = Depends(facebook_service.get_http_session)):
     """Get list of available ad accounts from Meta API"""
-    import aiohttp
-    from core.config import META_TOKEN, API_VERSION
-    
+    from core.config import META_TOKEN
+
     if not META_TOKEN:
         raise HTTPException(status_code=500, detail="Token not configured")
-    
+
     try:
-        async with aiohttp.ClientSession() as session:
-            url = f"https://graph.facebook.com/{API_VERSION}/me/adaccounts"
-            params = {
-                "access_token": META_TOKEN,
-                "fields": "name,account_id",
-                "limit": 500
+        accounts = await facebook_service.get_ad_accounts(session)
+        return [
+            {
+                "account_id": acc.get("account_id", "").replace("act_", ""),
+                "account_name": acc.get("name", "Unknown")
             }
-            async with session.get(url, params=params) as response:
-                if response.status != 200:
-                    error_data = await response.json()
-                    raise Exception(f"Facebook API error: {error_data}")
-                data = await response.json()
-                accounts = data.get("data", [])
-                return [
-                    {
-                        "account_id": acc.get("account_id", "").replace("act_", ""),
-                        "account_name": acc.get("name", "Unknown")
-                    }
-                    for acc in accounts
-                ]
+            for acc in accounts
+        ]
     except Exception as e:
         logging.error(f"Error fetching accounts from Meta: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/clients/{account_id}/payments", response_model=List[PaymentResponse])
 async def get_client_payments(account_id: str):
-    client = get_client_row_by_account(account_id)
+    client = await get_client_row_by_account(account_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
     query = text("""
@@ -430,19 +377,16 @@ async def get_client_payments(account_id: str):
         WHERE client_id = :client_id
         ORDER BY paid_at DESC, created_at DESC
     """)
-    with engine.connect() as conn:
-        rows = conn.execute(query, {"client_id": client["id"]}).mappings().all()
+    async with async_engine.connect() as conn:
+        rows = (await conn.execute(query, {"client_id": client["id"]})).mappings().all()
         return [serialize_payment_row(row) for row in rows]
 
 @router.post("/clients/{account_id}/payments", response_model=PaymentResponse)
 async def add_client_payment(account_id: str, payload: PaymentCreate):
-    client = get_client_row_by_account(account_id)
+    client = await get_client_row_by_account(account_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
-    try:
-        paid_at = datetime.fromisoformat(payload.paid_at).date()
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    paid_at = parse_iso_date(payload.paid_at)
     insert_sql = text("""
         INSERT INTO client_payments (client_id, paid_at, amount, note)
         VALUES (:client_id, :paid_at, :amount, :note)
@@ -455,8 +399,9 @@ async def add_client_payment(account_id: str, payload: PaymentCreate):
         "note": payload.note,
     }
     try:
-        with engine.begin() as conn:
-            row = conn.execute(insert_sql, params).mappings().first()
+        async with async_engine.begin() as conn:
+            row = (await conn.execute(insert_sql, params)).mappings().first()
+            await apply_payment_delta(conn, client["id"], payload.amount)
             return serialize_payment_row(row)
     except SQLAlchemyError as e:
         logging.error(f"Error adding payment: {e}", exc_info=True)
@@ -464,21 +409,14 @@ async def add_client_payment(account_id: str, payload: PaymentCreate):
 
 @router.put("/clients/{account_id}/payments/{payment_id}", response_model=PaymentResponse)
 async def update_client_payment(account_id: str, payment_id: int, payload: PaymentUpdate):
-    client = get_client_row_by_account(account_id)
+    client = await get_client_row_by_account(account_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
-    payment = get_payment_row(payment_id, client_id=client["id"])
-    if not payment:
-        raise HTTPException(status_code=404, detail="Payment not found")
     updates = []
-    params = {"payment_id": payment_id}
+    params = {"payment_id": payment_id, "client_id": client["id"]}
     if payload.paid_at is not None:
-        try:
-            paid_at = datetime.fromisoformat(payload.paid_at).date()
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
         updates.append("paid_at = :paid_at")
-        params["paid_at"] = paid_at
+        params["paid_at"] = parse_iso_date(payload.paid_at)
     if payload.amount is not None:
         updates.append("amount = :amount")
         params["amount"] = payload.amount
@@ -490,14 +428,55 @@ async def update_client_payment(account_id: str, payment_id: int, payload: Payme
     update_sql = text(f"""
         UPDATE client_payments
         SET {', '.join(updates)}
-        WHERE id = :payment_id
+        WHERE id = :payment_id AND client_id = :client_id
         RETURNING id, client_id, paid_at, amount, note, created_at
     """)
     try:
-        with engine.begin() as conn:
-            row = conn.execute(update_sql, params).mappings().first()
+        async with async_engine.begin() as conn:
+            # the old amount is read under a lock in the same transaction as the update and the totals
+            # delta, so concurrent edits of one payment can't apply a delta against a stale amount
+            lock = ""
+            if conn.dialect.name == "sqlite":
+                # no FOR UPDATE, and pysqlite only opens the transaction at the first write: take the write lock now
+                await conn.exec_driver_sql("BEGIN IMMEDIATE")
+            else:
+                lock = " FOR UPDATE"
+            old_amount = (await conn.execute(
+                text(f"SELECT amount FROM client_payments WHERE id = :payment_id AND client_id = :client_id{lock}"),
+                {"payment_id": payment_id, "client_id": client["id"]},
+            )).scalar()
+            if old_amount is None:
+                raise HTTPException(status_code=404, detail="Payment not found")
+            row = (await conn.execute(update_sql, params)).mappings().first()
+            # also recomputes last_payment_at, which a paid_at change can move
+            await apply_payment_delta(conn, client["id"], float(row["amount"]) - float(old_amount))
             return serialize_payment_row(row)
+    except HTTPException:
+        raise
     except SQLAlchemyError as e:
         logging.error(f"Error updating payment: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to update payment")
 
+@router.delete("/clients/{account_id}/payments/{payment_id}")
+async def delete_client_payment(account_id: str, payment_id: int):
+    client = await get_client_row_by_account(account_id)
+    if not client:
+        raise HTTPException(status_code=404, detail="Client not found")
+    delete_sql = text("""
+        DELETE FROM client_payments
+        WHERE id = :payment_id AND client_id = :client_id
+        RETURNING amount
+    """)
+    try:
+        async with async_engine.begin() as conn:
+            row = (await conn.execute(delete_sql, {"payment_id": payment_id, "client_id": client["id"]})).mappings().first()
+            if not row:
+                raise HTTPException(status_code=404, detail="Payment not found")
+            await apply_payment_delta(conn, client["id"], -float(row["amount"]))
+        return {"message": "Payment deleted successfully"}
+    except HTTPException:
+        raise
+    except SQLAlchemyError as e:
+        logging.error(f"Error deleting payment: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to delete payment")
+
@@ -0,0 +1,34 @@
+# backend/api/overview_endpoints.py
+
+import logging
+from typing import Optional
+
+import aiohttp
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+
+from core.config import META_TOKEN
+from services import facebook_service, overview_service
+
+router = APIRouter()
+
+@router.get("/overview/clients")
+async def get_clients_overview(
+    response: Response,
+    date_preset: str = Query("today"),
+    start_date: Optional[str] = Query(None),
+    end_date: Optional[str] = Query(None),
+    session: aiohttp.ClientSession = Depends(facebook_service.get_http_session),
+):
+    """Per-client spend, leads, CPL, active adsets/ads and remaining monthly budget."""
+    if not META_TOKEN:
+        raise HTTPException(status_code=500, detail="Token not configured")
+    try:
+        data, cache_status, age = await overview_service.get_clients_overview(session, date_preset, start_date, end_date)
+        response.headers["X-Cache"] = cache_status
+        response.headers["Age"] = str(age)
+        if data["errors"]:
+            response.headers["X-Account-Errors"] = ",".join(str(err["account_id"]) for err in data["errors"])
+        return data
+    except Exception as e:
+        logging.error(f"Error building clients overview: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,594 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for the Meta Graph API
+
+Serves the edges facebook_service uses, from deterministic synthetic data
+(N ad accounts x M adsets x K ads, daily metrics since FAKE_START):
+
+    /me, /me/adaccounts, /act_X/adsets, /act_X/ads, /act_X/insights (sync and async report runs),
+    /{adset}/ads, /{id}/insights (daily, level=ad, hourly breakdown), /{id}/adactivity,
+    /{id} (details, status/budget updates), /?ids=..., and POST / with `batch`
+
+with cursor paging, configurable latency, Meta usage headers and throttling errors.
+Point the backend at it with GRAPH_API_BASE_URL:
+
+    python bench/fake_graph.py --port 8900 --accounts 10 --adsets 50 --ads 4 --latency-ms 80
+    GRAPH_API_BASE_URL=http://127.0.0.1:8900 META_ACCESS_TOKEN=fake uvicorn main:app
+
+GET /__stats returns request counters per edge, POST /__reset clears them.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import re
+import sys
+import time
+import zlib
+from collections import Counter, deque
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from aiohttp import web
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from core.config import LEAD_ACTION_TYPE
+
+FAKE_START = date(2025, 6, 1)
+ACCOUNT_BASE = 100000000000000
+OBJECTIVES = ["OUTCOME_LEADS", "OUTCOME_ENGAGEMENT", "OUTCOME_TRAFFIC", "MESSAGES"]
+HOURLY_BREAKDOWN = "hourly_stats_aggregated_by_advertiser_time_zone"
+VERSION_RE = re.compile(r"^v\d+\.\d+$")
+
+class GraphError(Exception):
+    def __init__(self, status: int, code: int, message: str, subcode: Optional[int] = None):
+        super().__init__(message)
+        self.status, self.code, self.subcode = status, code, subcode
+
+    def body(self) -> dict:
+        error = {"message": self.message, "type": "OAuthException", "code": self.code, "fbtrace_id": "fake"}
+        if self.subcode:
+            error["error_subcode"] = self.subcode
+        return {"error": error}
+
+    @property
+    def message(self) -> str:
+        return self.args[0]
+
+# --- Synthetic objects (ids encode their parents: 23AAAAASSSSS adset, 25AAAAASSSSSKKK ad) ---
+
+def account_id(a: int) -> str:
+    return str(ACCOUNT_BASE + a)
+
+def adset_id(a: int, s: int) -> str:
+    return f"23{a:05d}{s:05d}"
+
+def ad_id(a: int, s: int, k: int) -> str:
+    return f"25{a:05d}{s:05d}{k:03d}"
+
+def parse_id(object_id: str) -> Tuple[str, tuple]:
+    if object_id.startswith("act_"):
+        return "account", (int(object_id[4:]) - ACCOUNT_BASE,)
+    if object_id.startswith("23") and len(object_id) == 12:
+        return "adset", (int(object_id[2:7]), int(object_id[7:12]))
+    if object_id.startswith("25") and len(object_id) == 15:
+        return "ad", (int(object_id[2:7]), int(object_id[7:12]), int(object_id[12:15]))
+    if object_id.startswith("24") and len(object_id) == 12:
+        return "campaign", (int(object_id[2:7]), int(object_id[7:12]))
+    if object_id.startswith("9") and object_id.isdigit():
+        return "report", ()
+    return "unknown", ()
+
+def _unit(*key) -> float:
+    """Deterministic pseudo-random number in [0, 1) for a key."""
+    return (zlib.crc32(":".join(map(str, key)).encode()) % 100000) / 100000.0
+
+def _fields(value: Optional[str]) -> List[str]:
+    """Top-level names of a Graph `fields` param ("a,b{c,d},e" -> [a, b, e])."""
+    names, depth, current = [], 0, ""
+    for char in value or "":
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+        elif char == "," and depth == 0:
+            names.append(current.strip())
+            current = ""
+            continue
+        if depth == 0 and char not in "{}":
+            current += char
+    if current.strip():
+        names.append(current.strip())
+    return names
+
+def _select(obj: dict, fields: Optional[str]) -> dict:
+    names = _fields(fields)
+    if not names:
+        return {"id": obj["id"], "name": obj.get("name")} if "name" in obj else {"id": obj["id"]}
+    return {name: obj[name] for name in ["id"] + names if name in obj}
+
+@lru_cache(maxsize=200000)
+def daily_metrics(object_id: str, day: date) -> Tuple[float, int, int, int, int, int]:
+    """(spend, impressions, reach, clicks, link_clicks, leads) of one object on one day."""
+    u1, u2, u3 = _unit(object_id, day, 1), _unit(object_id, day, 2), _unit(object_id, day, 3)
+    spend = round(4 + 26 * u1, 2)
+    impressions = int(spend * (90 + 80 * u2))
+    reach = max(1, int(impressions / (1.1 + u3)))
+    clicks = int(impressions * (0.008 + 0.02 * u3))
+    link_clicks = int(clicks * (0.4 + 0.4 * u2))
+    leads = int(spend / (2.5 + 6 * u3))
+    return spend, impressions, reach, clicks, link_clicks, leads
+
+def _metrics_row(object_id: str, days: List[date], fields: List[str], hour: Optional[int] = None) -> dict:
+    spend = impressions = reach = clicks = link_clicks = leads = 0
+    for day in days:
+        d_spend, d_impressions, d_reach, d_clicks, d_link_clicks, d_leads = daily_metrics(object_id, day)
+        spend += d_spend; impressions += d_impressions; reach += d_reach
+        clicks += d_clicks; link_clicks += d_link_clicks; leads += d_leads
+    if hour is not None:
+        # дневные значения, разложенные по часам (днём больше, ночью меньше)
+        weight = (0.3 + abs(12 - abs(hour - 14)) / 12) / 14.6
+        spend, impressions, reach = spend * weight, int(impressions * weight), int(reach * weight)
+        clicks, link_clicks, leads = int(clicks * weight), int(link_clicks * weight), int(round(leads * weight))
+
+    values = {
+        "spend": f"{spend:.2f}",
+        "impressions": str(impressions),
+        "reach": str(reach),
+        "clicks": str(clicks),
+        "inline_link_clicks": str(link_clicks),
+        "frequency": f"{impressions / reach:.6f}" if reach else "0",
+        "ctr": f"{clicks / impressions * 100:.6f}" if impressions else "0",
+        "cpm": f"{spend / impressions * 1000:.6f}" if impressions else "0",
+        "actions": [
+            {"action_type": "link_click", "value": str(link_clicks)},
+            {"action_type": LEAD_ACTION_TYPE, "value": str(leads)},
+            {"action_type": "onsite_conversion.lead_grouped", "value": str(leads // 3)},
+        ] if leads else [{"action_type": "link_click", "value": str(link_clicks)}],
+        "cost_per_action_type": [{"action_type": LEAD_ACTION_TYPE, "value": f"{spend / leads:.6f}"}] if leads else [],
+    }
+    return {name: values[name] for name in fields if name in values}
+
+class FakeGraph:
+    def __init__(self, accounts: int = 3, adsets: int = 20, ads: int = 3, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 call_limit: int = 0, window: float = 60.0, error_rate: float = 0.0, report_polls: int = 0, seed: int = 0,
+                 throttled_accounts: Tuple[int, ...] = (), batch_timeout_edges: Tuple[str, ...] = ()):
+        self.accounts, self.adsets, self.ads = accounts, adsets, ads
+        self.latency_ms, self.jitter_ms = latency_ms, jitter_ms
+        self.call_limit, self.window = call_limit, window
+        self.error_rate, self.report_polls = error_rate, report_polls
+        # account indexes whose /act_X calls always fail with the ad-account throttling error
+        self.throttled_accounts = set(throttled_accounts)
+        # edges whose batch sub-requests come back as null, as when Meta's batch times out on them
+        self.batch_timeout_edges = set(batch_timeout_edges)
+        self.random = random.Random(seed)
+        self.stats: Counter = Counter()
+        self._calls: Dict[str, deque] = {}
+        self._reports: Dict[str, dict] = {}
+
+    # --- objects ---
+
+    def account(self, a: int) -> dict:
+        return {"id": f"act_{account_id(a)}", "account_id": account_id(a), "name": f"Fake Account {a:02d}",
+                "currency": "USD", "timezone_name": "Asia/Baku", "account_status": 1}
+
+    def adset(self, a: int, s: int) -> dict:
+        campaign = f"24{a:05d}{s // 5:05d}"
+        status = "PAUSED" if s % 4 == 3 else "ACTIVE"
+        return {
+            "id": adset_id(a, s), "account_id": account_id(a), "name": f"Adset {a:02d}-{s:03d}",
+            "campaign": {"id": campaign, "name": f"Campaign {a:02d}-{s // 5:02d}", "objective": OBJECTIVES[s % len(OBJECTIVES)]},
+            "campaign_id": campaign, "status": status, "effective_status": status,
+            "daily_budget": str(1000 + 500 * (s % 6)), "lifetime_budget": "0",
+            "start_time": f"{FAKE_START.isoformat()}T00:00:00+0400", "end_time": None,
+            "updated_time": f"{FAKE_START.isoformat()}T12:00:00+0400",
+        }
+
+    def ad(self, a: int, s: int, k: int) -> dict:
+        status = "PAUSED" if k % 3 == 2 or s % 4 == 3 else "ACTIVE"
+        creative = f"26{a:05d}{s:05d}{k:03d}"
+        return {
+            "id": ad_id(a, s, k), "account_id": account_id(a), "adset_id": adset_id(a, s), "name": f"Ad {a:02d}-{s:03d}-{k}",
+            "status": status, "effective_status": status,
+            "creative": {"id": creative, "thumbnail_url": f"https://fake.invalid/thumb/{creative}.jpg",
+                         "image_url": f"https://fake.invalid/img/{creative}.jpg"},
+        }
+
+    def _account_index(self, object_id: str) -> int:
+        kind, parts = parse_id(object_id)
+        if kind == "unknown" or not 0 <= parts[0] < self.accounts:
+            raise GraphError(400, 100, f"Unsupported get request. Object with ID '{object_id}' does not exist")
+        return parts[0]
+
+    def _check(self, kind: str, parts: tuple, object_id: str) -> None:
+        limits = (self.accounts, self.adsets, self.ads)
+        if kind in ("unknown", "report") or any(not 0 <= p < limit for p, limit in zip(parts, limits)):
+            raise GraphError(400, 100, f"Unsupported get request. Object with ID '{object_id}' does not exist")
+
+    # --- insights ---
+
+    @staticmethod
+    def date_range(query: dict) -> Tuple[date, date]:
+        today = date.today()
+        if query.get("time_range"):
+            bounds = json.loads(query["time_range"])
+            since, until = date.fromisoformat(bounds["since"]), date.fromisoformat(bounds["until"])
+        else:
+            preset = query.get("date_preset", "last_30d")
+            if preset == "today":
+                since = until = today
+            elif preset == "yesterday":
+                since = until = today - timedelta(days=1)
+            elif preset == "this_month":
+                since, until = today.replace(day=1), today
+            elif preset == "last_month":
+                until = today.replace(day=1) - timedelta(days=1)
+                since = until.replace(day=1)
+            elif preset == "maximum":
+                since, until = FAKE_START, today
+            else:
+                match = re.match(r"last_(\d+)d", preset)
+                days = int(match.group(1)) if match else 30
+                since, until = today - timedelta(days=days), today - timedelta(days=1)
+        return max(since, FAKE_START), min(until, today)
+
+    def insights_rows(self, object_id: str, query: dict) -> Tuple[int, Callable[[int], dict]]:
+        """(row count, row(i)) for an insights query, so a page is built without materializing the rest."""
+        kind, parts = parse_id(object_id)
+        self._check(kind, parts, object_id)
+        level = query.get("level") or kind
+        a = parts[0]
+
+        if kind == "account":
+            adset_indexes = range(self.adsets)
+            allowed = _filter_ids(query.get("filtering"), "adset.id")
+            if allowed is not None:
+                adset_indexes = [s for s in adset_indexes if adset_id(a, s) in allowed]
+        elif kind == "adset":
+            adset_indexes = [parts[1]]
+        else:
+            adset_indexes = []
+
+        if level == "ad":
+            if kind == "ad":
+                objects = [(ad_id(*parts), parts[1], parts[2])]
+            else:
+                objects = [(ad_id(a, s, k), s, k) for s in adset_indexes for k in range(self.ads)]
+        elif level == "adset":
+            objects = [(adset_id(a, s), s, None) for s in adset_indexes]
+        else:
+            objects = [(object_id if kind != "account" else f"act_{account_id(a)}", None, None)]
+
+        since, until = self.date_range(query)
+        all_days = [since + timedelta(days=i) for i in range(max(0, (until - since).days + 1))]
+        daily = str(query.get("time_increment")) == "1"
+        hourly = query.get("breakdowns") == HOURLY_BREAKDOWN
+        day_groups = [[day] for day in all_days] if daily else ([all_days] if all_days else [])
+        hours = 24 if hourly else 1
+        fields = _fields(query.get("fields")) or ["spend", "impressions"]
+        per_object = len(day_groups) * hours
+
+        def row(i: int) -> dict:
+            obj, rest = divmod(i, per_object)
+            group, hour = divmod(rest, hours)
+            object_key, s, k = objects[obj]
+            days = day_groups[group]
+            result = _metrics_row(object_key, days, fields, hour if hourly else None)
+            ids = {"account_id": account_id(a), "campaign_id": f"24{a:05d}{(s or 0) // 5:05d}",
+                   "adset_id": adset_id(a, s) if s is not None else None, "ad_id": ad_id(a, s, k) if k is not None else None}
+            for name in ("account_id", "campaign_id", "adset_id", "ad_id"):
+                if name in fields and ids[name] is not None:
+                    result[name] = ids[name]
+            if hourly:
+                result[HOURLY_BREAKDOWN] = f"{hour:02d}:00:00 - {hour:02d}:59:59"
+            result["date_start"], result["date_stop"] = days[0].isoformat(), days[-1].isoformat()
+            return result
+
+        return len(objects) * per_object, row
+
+    # --- request handling ---
+
+    def dispatch(self, method: str, path: str, query: dict, body: dict) -> Tuple[int, dict, Optional[Tuple[int, Callable]]]:
+        """
+        Route one (sub-)request. Returns (status, body, listing): list edges return their rows as
+        `listing` = (count, row(i)) and are paged by the caller.
+        """
+        segments = [s for s in path.strip("/").split("/") if s]
+        if segments and VERSION_RE.match(segments[0]):
+            segments = segments[1:]
+        if not query.get("access_token"):
+            raise GraphError(400, 190, "An active access token must be used to query information about the current user.")
+
+        if not segments:
+            ids = [i for i in query.get("ids", "").split(",") if i]
+            result = {}
+            for object_id in ids:
+                result[object_id] = _select(self._object(object_id), query.get("fields"))
+            return 200, result, None
+
+        head, edge = segments[0], (segments[1] if len(segments) > 1 else None)
+        if head == "me":
+            if edge == "adaccounts":
+                return 200, {}, (self.accounts, lambda i: _select(self.account(i), query.get("fields")))
+            return 200, {"id": "1000000000", "name": "Fake Graph User"}, None
+
+        kind, parts = parse_id(head)
+        if kind == "report":
+            return self._report(head, edge, query)
+
+        if edge is None:
+            if method == "POST":
+                self._object(head)
+                return 200, {"success": True}, None
+            return 200, _select(self._object(head), query.get("fields")), None
+
+        if edge == "insights":
+            if method == "POST":
+                self._check(kind, parts, head)
+                report_id = f"9{len(self._reports) + 1:011d}"
+                self._reports[report_id] = {"object_id": head, "query": {**body, **query}, "polls": 0}
+                return 200, {"report_run_id": report_id}, None
+            return 200, {}, self.insights_rows(head, query)
+        if edge == "adsets" and kind == "account":
+            a = self._account_index(head)
+            return 200, {}, (self.adsets, lambda i: _select(self.adset(a, i), query.get("fields")))
+        if edge == "ads":
+            return self._ads(head, kind, parts, query)
+        if edge in ("adactivity", "activities"):
+            self._check(kind, parts, head)
+            return 200, {}, (30, lambda i: self._activity(head, i))
+        raise GraphError(400, 100, f"Tried accessing nonexisting field ({edge})")
+
+    def _object(self, object_id: str) -> dict:
+        kind, parts = parse_id(object_id)
+        self._check(kind, parts, object_id)
+        if kind == "account":
+            return self.account(*parts)
+        if kind == "adset":
+            return self.adset(*parts)
+        if kind == "ad":
+            return self.ad(*parts)
+        a, c = parts
+        return {"id": object_id, "account_id": account_id(a), "name": f"Campaign {a:02d}-{c:02d}", "objective": OBJECTIVES[0]}
+
+    def _ads(self, object_id: str, kind: str, parts: tuple, query: dict):
+        self._check(kind, parts, object_id)
+        if kind == "adset":
+            ads = [self.ad(parts[0], parts[1], k) for k in range(self.ads)]
+        elif kind == "account":
+            allowed = _filter_ids(query.get("filtering"), "adset.id")
+            ads = [
+                self.ad(parts[0], s, k) for s in range(self.adsets) for k in range(self.ads)
+                if allowed is None or adset_id(parts[0], s) in allowed
+            ]
+        else:
+            raise GraphError(400, 100, "Tried accessing nonexisting field (ads)")
+        if query.get("effective_status"):
+            statuses = set(json.loads(query["effective_status"]))
+            ads = [ad for ad in ads if ad["effective_status"] in statuses]
+        extra = {"summary": {"total_count": len(ads)}} if query.get("summary") else {}
+        return 200, extra, (len(ads), lambda i: _select(ads[i], query.get("fields")))
+
+    def _activity(self, object_id: str, i: int) -> dict:
+        changed = datetime(2025, 9, 30, 12) - timedelta(hours=7 * i)
+        event_type, extra = [
+            ("update_ad_set_budget", {"old_value": {"new_value": 1000}, "new_value": {"new_value": 1500}, "daily_budget": "1500"}),
+            ("update_ad_set_run_status", {"old_value": "Inactive", "new_value": "Active", "status": "ACTIVE"}),
+            ("update_ad_set_target_spec", {"name": "Audience update"}),
+        ][i % 3]
+        return {"event_time": changed.strftime("%Y-%m-%dT%H:%M:%S+0000"), "event_type": event_type,
+                "actor_id": "1000000000", "actor_name": "Fake Graph User", "object_id": object_id,
+                "extra_data": json.dumps(extra)}
+
+    def _report(self, report_id: str, edge: Optional[str], query: dict):
+        report = self._reports.get(report_id)
+        if report is None:
+            raise GraphError(400, 100, f"Unsupported get request. Object with ID '{report_id}' does not exist")
+        if edge == "insights":
+            return 200, {}, self.insights_rows(report["object_id"], report["query"])
+        report["polls"] += 1
+        done = report["polls"] > self.report_polls
+        return 200, {
+            "id": report_id, "async_status": "Job Completed" if done else "Job Running",
+            "async_percent_completion": 100 if done else int(100 * report["polls"] / (self.report_polls + 1)),
+        }, None
+
+    # --- usage / throttling ---
+
+    def _usage(self, key: str) -> float:
+        now = time.monotonic()
+        calls = self._calls.setdefault(key, deque())
+        calls.append(now)
+        while calls and calls[0] < now - self.window:
+            calls.popleft()
+        return 100.0 * len(calls) / self.call_limit if self.call_limit else 100.0 * len(calls) / 10000
+
+    def count_call(self, path: str) -> Tuple[float, Optional[str], float]:
+        """Record one call; returns (app usage %, ad account key, account usage %) or raises a throttling error."""
+        match = re.search(r"/(act_\d+)(?:/|$)", "/" + path.strip("/"))
+        account_key = match.group(1) if match else None
+        app_pct = self._usage("app")
+        account_pct = self._usage(account_key) if account_key else 0.0
+        if account_key and any(account_key == f"act_{account_id(a)}" for a in self.throttled_accounts):
+            self.stats["throttled"] += 1
+            raise GraphError(400, 80004, "There have been too many calls to this ad-account.", 2446079)
+        if self.call_limit and account_pct > 100:
+            self.stats["throttled"] += 1
+            raise GraphError(400, 80004, "There have been too many calls to this ad-account.", 2446079)
+        if self.call_limit and app_pct > 100 * max(1, self.accounts):
+            self.stats["throttled"] += 1
+            raise GraphError(400, 4, "Application request limit reached")
+        return app_pct, account_key, account_pct
+
+    def usage_headers(self, app_pct: float, account_key: Optional[str], account_pct: float) -> Dict[str, str]:
+        app = min(100, int(app_pct / max(1, self.accounts)))
+        headers = {"X-App-Usage": json.dumps({"call_count": app, "total_cputime": app // 2, "total_time": app // 2})}
+        if account_key:
+            headers["X-Ad-Account-Usage"] = json.dumps({
+                "acc_id_util_pct": round(min(account_pct, 100), 2), "reset_time_duration": int(self.window), "ads_api_access_tier": "standard_access",
+            })
+        return headers
+
+    def page(self, request_url: str, query: dict, body: dict, listing: Tuple[int, Callable[[int], dict]]) -> dict:
+        count, row = listing
+        limit = max(1, min(int(query.get("limit", 25)), 5000))
+        offset = _decode_cursor(query.get("after"))
+        end = min(count, offset + limit)
+        page = dict(body)
+        page["data"] = [row(i) for i in range(offset, end)]
+        paging = {"cursors": {"before": _encode_cursor(offset), "after": _encode_cursor(max(offset, end - 1) + 1)}}
+        if end < count:
+            paging["next"] = f"{request_url}?{urlencode({**query, 'after': _encode_cursor(end)})}"
+        if offset > 0:
+            paging["previous"] = f"{request_url}?{urlencode({**query, 'before': _encode_cursor(offset)})}"
+        page["paging"] = paging
+        return page
+
+    def handle(self, method: str, base_url: str, path: str, query: dict, body: dict) -> Tuple[int, dict, Dict[str, str]]:
+        """One Graph call (a top-level request or one batch sub-request) -> (status, JSON body, headers)."""
+        edge = _edge_name(path)
+        self.stats[f"edge:{edge}"] += 1
+        try:
+            usage = self.count_call(path)
+            if self.error_rate and self.random.random() < self.error_rate:
+                raise GraphError(500, 2, "An unexpected error has occurred. Please retry your request later.")
+            status, result, listing = self.dispatch(method, path, query, body)
+            if listing is not None:
+                result = self.page(f"{base_url}/{path.strip('/')}", query, result, listing)
+            return status, result, self.usage_headers(*usage)
+        except GraphError as e:
+            self.stats["errors"] += 1
+            return e.status, e.body(), {}
+        except (ValueError, KeyError, TypeError) as e:
+            self.stats["errors"] += 1
+            return 400, GraphError(400, 100, f"Invalid parameter: {e}").body(), {}
+
+    async def _delay(self) -> None:
+        if self.latency_ms or self.jitter_ms:
+            await asyncio.sleep(max(0.0, self.random.gauss(self.latency_ms, self.jitter_ms)) / 1000)
+
+    async def handle_request(self, request: web.Request) -> web.Response:
+        self.stats["http_requests"] += 1
+        await self._delay()
+        base_url = f"{request.scheme}://{request.host}"
+        query = dict(request.query)
+        body = await _request_body(request)
+
+        if request.method == "POST" and request.path.strip("/") == "" and "batch" in body:
+            self.stats["batches"] += 1
+            batch = body["batch"] if isinstance(body["batch"], list) else json.loads(body["batch"])
+            responses = []
+            for sub in batch:
+                sub_path, _, sub_query = sub.get("relative_url", "").partition("?")
+                if _edge_name(sub_path) in self.batch_timeout_edges:
+                    self.stats["batch_timeouts"] += 1
+                    responses.append(None)
+                    continue
+                params = {**dict(parse_qsl(sub_query)), "access_token": query.get("access_token") or body.get("access_token")}
+                status, result, headers = self.handle(sub.get("method", "GET").upper(), base_url, sub_path, params, {})
+                responses.append({"code": status, "headers": [{"name": k, "value": v} for k, v in headers.items()],
+                                  "body": json.dumps(result)})
+            return web.json_response(responses)
+
+        status, result, headers = self.handle(request.method, base_url, request.path, query, body)
+        return web.json_response(result, status=status, headers=headers)
+
+    async def stats_handler(self, request: web.Request) -> web.Response:
+        if request.method == "POST":
+            self.stats.clear()
+            return web.json_response({"reset": True})
+        by_edge = {key[5:]: value for key, value in self.stats.items() if key.startswith("edge:")}
+        return web.json_response({
+            "http_requests": self.stats["http_requests"], "batches": self.stats["batches"],
+            "graph_calls": sum(by_edge.values()), "by_edge": by_edge,
+            "throttled": self.stats["throttled"], "errors": self.stats["errors"], "batch_timeouts": self.stats["batch_timeouts"],
+        })
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=16 * 1024 * 1024)
+        app.router.add_route("*", "/__stats", self.stats_handler)
+        app.router.add_route("*", "/__reset", self.stats_handler)
+        app.router.add_route("*", "/{tail:.*}", self.handle_request)
+        return app
+
+def _edge_name(path: str) -> str:
+    segments = [s for s in path.strip("/").split("/") if s and not VERSION_RE.match(s)]
+    if not segments:
+        return "ids"
+    if len(segments) == 1:
+        return "me" if segments[0] == "me" else ("report" if parse_id(segments[0])[0] == "report" else "object")
+    return segments[-1]
+
+def _filter_ids(filtering: Optional[str], field: str) -> Optional[set]:
+    if not filtering:
+        return None
+    for rule in json.loads(filtering):
+        if rule.get("field") == field and rule.get("operator") == "IN":
+            return set(map(str, rule.get("value") or []))
+    return None
+
+def _encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(str(offset).encode()).decode()
+
+def _decode_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+
+async def _request_body(request: web.Request) -> dict:
+    if request.method != "POST" or not request.can_read_body:
+        return {}
+    if request.content_type == "application/json":
+        body = await request.json()
+        return body if isinstance(body, dict) else {}
+    return dict(await request.post())
+
+async def start_fake_graph(host: str = "127.0.0.1", port: int = 0, **options) -> Tuple[web.AppRunner, str, FakeGraph]:
+    """Start the fake Graph API in the running loop. Returns (runner, base URL, FakeGraph)."""
+    graph = FakeGraph(**options)
+    runner = web.AppRunner(graph.app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{bound_port}", graph
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stand-in for the Meta Graph API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--accounts", type=int, default=3)
+    parser.add_argument("--adsets", type=int, default=20, help="adsets per account")
+    parser.add_argument("--ads", type=int, default=3, help="ads per adset")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mean added latency per HTTP request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="standard deviation of the added latency")
+    parser.add_argument("--call-limit", type=int, default=0, help="calls per ad account per window before throttling (0 = off)")
+    parser.add_argument("--window", type=float, default=60.0, help="usage window in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls failing with a transient error")
+    parser.add_argument("--throttle-account", type=int, action="append", default=[],
+                        help="account index whose calls always fail with a throttling error (repeatable)")
+    parser.add_argument("--batch-timeout-edge", action="append", default=[],
+                        help="edge (e.g. insights) whose batch sub-requests return null, like a timed-out batch (repeatable)")
+    parser.add_argument("--report-polls", type=int, default=0, help="status polls before an async report completes")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    graph = FakeGraph(
+        accounts=args.accounts, adsets=args.adsets, ads=args.ads, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        call_limit=args.call_limit, window=args.window, error_rate=args.error_rate, report_polls=args.report_polls, seed=args.seed,
+        throttled_accounts=tuple(args.throttle_account), batch_timeout_edges=tuple(args.batch_timeout_edge),
+    )
+    print(f"Fake Graph API on http://{args.host}:{args.port} "
+          f"({args.accounts} accounts x {args.adsets} adsets x {args.ads} ads)")
+    web.run_app(graph.app(), host=args.host, port=args.port, access_log=None, print=None)
+
+if __name__ == "__main__":
+    main()
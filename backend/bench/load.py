@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for the dashboard request mix
+
+Starts bench/fake_graph.py in a subprocess, runs main:app in-process (httpx ASGI transport, lifespan
+included) against it, and has --users virtual users repeat the dashboard page load:
+
+    GET /api/adsets + GET /api/clients                     (in parallel, as the frontend does)
+    GET /api/adsets/{id}/ads for --ads-per-page adsets      (expanded table rows)
+    --modals x stats modal: /stats, /ads?date_preset=maximum, /time-insights
+
+Reports req/s, p50/p95/p99 per route template and per page load, Graph calls per page load
+(from the fake's /__stats) and event-loop lag. The JSON report is meant to be kept per commit:
+
+    python bench/load.py --duration 30 --out before.json
+    python bench/load.py --duration 30 --compare before.json --max-regression 10
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from loop_lag import percentile, probe_lag, seed_sqlite
+from startup import free_port
+
+def start_fake_graph(args) -> tuple:
+    port = free_port()
+    proc = subprocess.Popen(
+        [
+            sys.executable, str(Path(__file__).resolve().parent / "fake_graph.py"), "--port", str(port),
+            "--accounts", str(args.accounts), "--adsets", str(args.adsets), "--ads", str(args.ads),
+            "--latency-ms", str(args.graph_latency_ms), "--jitter-ms", str(args.graph_jitter_ms),
+        ],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    while time.perf_counter() - started < 10:
+        if proc.poll() is not None:
+            raise RuntimeError(f"fake_graph exited with {proc.returncode}:\n{proc.stderr.read().decode()[-2000:]}")
+        try:
+            with urllib.request.urlopen(f"{base_url}/__stats", timeout=1):
+                return proc, base_url
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("fake_graph did not start within 10s")
+
+def graph_stats(base_url: str, reset: bool = False) -> dict:
+    request = urllib.request.Request(f"{base_url}/__reset" if reset else f"{base_url}/__stats", method="POST" if reset else "GET")
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read())
+
+def _summary(latencies: list) -> dict:
+    return {
+        "p50": round(percentile(latencies, 50), 2),
+        "p95": round(percentile(latencies, 95), 2),
+        "p99": round(percentile(latencies, 99), 2),
+        "max": round(max(latencies, default=0.0), 2),
+    }
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.failures = Counter()
+        self.cache = defaultdict(Counter)
+        self.measuring = False
+
+    async def get(self, client, route: str, url: str):
+        started = time.perf_counter()
+        response = await client.get(url)
+        elapsed = (time.perf_counter() - started) * 1000
+        if self.measuring:
+            self.latencies[route].append(elapsed)
+            if response.status_code != 200:
+                self.failures[route] += 1
+            if "x-cache" in response.headers:
+                self.cache[route][response.headers["x-cache"]] += 1
+        return response
+
+async def page_load(client, recorder: Recorder, args, rng: random.Random):
+    adsets, _ = await asyncio.gather(
+        recorder.get(client, "/api/adsets", f"/api/adsets?date_preset={args.date_preset}"),
+        recorder.get(client, "/api/clients", "/api/clients"),
+    )
+    adset_ids = [row["adset_id"] for row in adsets.json()] if adsets.status_code == 200 else []
+    if not adset_ids:
+        return
+    await asyncio.gather(*(
+        recorder.get(client, "/api/adsets/{adset_id}/ads", f"/api/adsets/{adset_id}/ads?date_preset={args.date_preset}")
+        for adset_id in rng.sample(adset_ids, min(args.ads_per_page, len(adset_ids)))
+    ))
+    for adset_id in rng.sample(adset_ids, min(args.modals, len(adset_ids))):
+        await asyncio.gather(
+            recorder.get(client, "/api/adsets/{adset_id}/stats", f"/api/adsets/{adset_id}/stats"),
+            recorder.get(client, "/api/adsets/{adset_id}/ads", f"/api/adsets/{adset_id}/ads?date_preset=maximum"),
+            recorder.get(client, "/api/adsets/{adset_id}/time-insights", f"/api/adsets/{adset_id}/time-insights"),
+        )
+
+async def run(args, graph_url: str) -> dict:
+    import httpx
+    from main import app
+
+    recorder, page_latencies = Recorder(), []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            rng = random.Random(args.seed)
+            # прогрев: первый заход заполняет кэши и пул соединений, в отчёт не идёт
+            for _ in range(args.warmup):
+                await page_load(client, recorder, args, rng)
+            graph_stats(graph_url, reset=True)
+            recorder.measuring = True
+
+            deadline = time.perf_counter() + args.duration
+            async def user(index: int):
+                user_rng = random.Random(args.seed + index)
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    await page_load(client, recorder, args, user_rng)
+                    page_latencies.append((time.perf_counter() - started) * 1000)
+                    if args.think_ms:
+                        await asyncio.sleep(user_rng.uniform(0, 2 * args.think_ms) / 1000)
+
+            lags, stop = [], asyncio.Event()
+            probe = asyncio.create_task(probe_lag(args.probe_interval / 1000, lags, stop))
+            started = time.perf_counter()
+            await asyncio.gather(*(user(i) for i in range(args.users)))
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await probe
+
+    graph = graph_stats(graph_url)
+    pages = len(page_latencies)
+    requests = sum(len(values) for values in recorder.latencies.values())
+    return {
+        "requests": requests,
+        "failures": sum(recorder.failures.values()),
+        "elapsed_s": round(elapsed, 2),
+        "req_per_s": round(requests / elapsed, 1),
+        "routes": {
+            route: {
+                "count": len(values),
+                "failures": recorder.failures[route],
+                "req_per_s": round(len(values) / elapsed, 1),
+                "latency_ms": _summary(values),
+                **({"cache": dict(recorder.cache[route])} if recorder.cache[route] else {}),
+            }
+            for route, values in sorted(recorder.latencies.items())
+        },
+        "page_load": {
+            "count": pages,
+            "per_s": round(pages / elapsed, 2),
+            "latency_ms": _summary(page_latencies),
+            "graph_calls": round(graph["graph_calls"] / pages, 2) if pages else None,
+            "graph_http_requests": round(graph["http_requests"] / pages, 2) if pages else None,
+            "graph_calls_by_edge": {edge: round(count / pages, 2) for edge, count in sorted(graph["by_edge"].items())} if pages else {},
+            "graph_throttled": graph["throttled"],
+            "graph_errors": graph["errors"],
+        },
+        "loop_lag_ms": {
+            "mean": round(statistics.fmean(lags), 2) if lags else 0.0,
+            "p50": round(percentile(lags, 50), 2),
+            "p99": round(percentile(lags, 99), 2),
+            "max": round(max(lags, default=0.0), 2),
+        },
+    }
+
+def git_revision() -> str:
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=backend_dir, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=backend_dir, capture_output=True, text=True).stdout.strip()
+        return f"{revision}-dirty" if dirty else revision
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(report: dict, baseline: dict, max_regression: float, min_delta_ms: float) -> list:
+    """
+    Print per-route deltas against a baseline report; returns the regressions over max_regression %.
+    Latencies that moved by less than min_delta_ms are not counted (1 ms -> 2 ms is noise, not +100%).
+    """
+    def delta(new, old):
+        return (new - old) / old * 100 if old else 0.0
+
+    regressions = []
+    print(f"{'':48}{'baseline':>12}{'current':>12}{'delta':>9}")
+    # (name, baseline, current, higher is worse; None = informational)
+    rows = [("req/s", baseline["req_per_s"], report["req_per_s"], False),
+            ("page load p95 ms", baseline["page_load"]["latency_ms"]["p95"], report["page_load"]["latency_ms"]["p95"], True),
+            ("graph calls / page", baseline["page_load"]["graph_calls"] or 0, report["page_load"]["graph_calls"] or 0, True),
+            ("loop lag p99 ms", baseline["loop_lag_ms"]["p99"], report["loop_lag_ms"]["p99"], None)]
+    for route, stats in report["routes"].items():
+        if route in baseline["routes"]:
+            rows.append((f"{route} p95 ms", baseline["routes"][route]["latency_ms"]["p95"], stats["latency_ms"]["p95"], True))
+    for name, old, new, higher_is_worse in rows:
+        change = delta(new, old)
+        print(f"{name:48}{old:>12}{new:>12}{change:>+8.1f}%")
+        # loop lag is too noisy at millisecond scale to gate on
+        if higher_is_worse is None or (name.endswith(" ms") and abs(new - old) < min_delta_ms):
+            continue
+        if (change if higher_is_worse else -change) > max_regression:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Load benchmark for the dashboard request mix")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of measured load")
+    parser.add_argument("--warmup", type=int, default=1, help="unmeasured page loads before the run")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="mean pause between a user's page loads")
+    parser.add_argument("--ads-per-page", type=int, default=5, help="/ads calls per page load")
+    parser.add_argument("--modals", type=int, default=1, help="stats modals opened per page load")
+    parser.add_argument("--date-preset", default="last_7d")
+    parser.add_argument("--accounts", type=int, default=5, help="fake Graph ad accounts")
+    parser.add_argument("--adsets", type=int, default=20, help="fake adsets per account")
+    parser.add_argument("--ads", type=int, default=3, help="fake ads per adset")
+    parser.add_argument("--graph-latency-ms", type=float, default=50.0)
+    parser.add_argument("--graph-jitter-ms", type=float, default=15.0)
+    parser.add_argument("--clients", type=int, default=200, help="seeded clients rows")
+    parser.add_argument("--payments", type=int, default=20000, help="seeded client_payments rows")
+    parser.add_argument("--probe-interval", type=float, default=5.0, help="ms between lag probes")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="with --compare: ignore latency changes smaller than this")
+    parser.add_argument("--out", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="baseline JSON report to diff against")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="with --compare: exit 1 if req/s, page load p95, Graph calls or a route p95 is worse by more than this %%")
+    args = parser.parse_args()
+
+    database_path = Path(tempfile.mkdtemp()) / "bench.db"
+    graph_proc, graph_url = start_fake_graph(args)
+    try:
+        os.environ["DATABASE_URL"] = f"sqlite:///{database_path}"
+        os.environ["GRAPH_API_BASE_URL"] = graph_url
+        os.environ["META_ACCESS_TOKEN"] = "bench"
+        os.environ["INSIGHTS_SYNC_ENABLED"] = "false"
+        logging.disable(logging.CRITICAL)
+
+        from core.migrations import run_migrations
+        run_migrations()
+        seed_sqlite(str(database_path), args.clients, args.payments)
+
+        report = {
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "config": {key: value for key, value in vars(args).items() if key not in ("out", "compare", "max_regression", "min_delta_ms")},
+            **asyncio.run(run(args, graph_url)),
+        }
+    finally:
+        graph_proc.terminate()
+        graph_proc.wait(timeout=10)
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(output + "\n")
+    if not args.compare:
+        print(output)
+        return
+
+    baseline = json.loads(Path(args.compare).read_text())
+    if baseline.get("config") != report["config"]:
+        print("warning: baseline was recorded with a different configuration", file=sys.stderr)
+    print(f"baseline {baseline.get('revision')}  ->  current {report['revision']}")
+    regressions = compare(report, baseline, args.max_regression if args.max_regression is not None else float("inf"), args.min_delta_ms)
+    if regressions:
+        print(f"regressions over {args.max_regression}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
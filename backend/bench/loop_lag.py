@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Event-loop lag under concurrent /api/clients traffic
+
+Runs main:app in-process (httpx ASGI transport) and fires concurrent requests at the clients
+and payments routes while a probe task measures how late the event loop wakes it up.
+A blocking DB call in a handler shows up directly as lag.
+
+    python bench/loop_lag.py                      # seeded temporary SQLite database
+    python bench/loop_lag.py --database-url postgresql://...  --no-seed
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+SQLITE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS clients (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        account_id TEXT UNIQUE NOT NULL,
+        account_name TEXT NOT NULL,
+        avatar_url TEXT,
+        monthly_budget NUMERIC NOT NULL DEFAULT 0,
+        start_date DATE NOT NULL,
+        monthly_payment_azn NUMERIC NOT NULL DEFAULT 0,
+        lead_action_types TEXT,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS client_payments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        client_id INTEGER REFERENCES clients(id) ON DELETE CASCADE,
+        paid_at DATE NOT NULL,
+        amount NUMERIC NOT NULL,
+        note TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS idx_client_payments_client_id ON client_payments(client_id);
+    CREATE TABLE IF NOT EXISTS client_payment_totals (
+        client_id INTEGER PRIMARY KEY REFERENCES clients(id) ON DELETE CASCADE,
+        total_paid NUMERIC NOT NULL DEFAULT 0,
+        last_payment_at DATE,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+def seed_sqlite(path: str, clients: int, payments: int):
+    conn = sqlite3.connect(path)
+    conn.executescript(SQLITE_SCHEMA)
+    conn.executemany(
+        "INSERT INTO clients (account_id, account_name, monthly_budget, start_date, monthly_payment_azn) VALUES (?, ?, ?, ?, ?)",
+        [(str(1000 + i), f"Client {i}", 1000, "2025-01-01", 300) for i in range(clients)],
+    )
+    conn.executemany(
+        "INSERT INTO client_payments (client_id, paid_at, amount) VALUES (?, ?, ?)",
+        [(random.randint(1, clients), f"2025-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}", 100) for _ in range(payments)],
+    )
+    conn.execute("""
+        INSERT INTO client_payment_totals (client_id, total_paid, last_payment_at)
+        SELECT client_id, SUM(amount), MAX(paid_at) FROM client_payments GROUP BY client_id
+    """)
+    conn.commit()
+    conn.close()
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+async def probe_lag(interval: float, lags: list, stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lags.append((loop.time() - started - interval) * 1000)
+
+async def run(args) -> dict:
+    import httpx
+    from main import app
+
+    transport = httpx.ASGITransport(app=app)
+    account_ids = [str(1000 + i) for i in range(min(args.clients, 50))]
+    latencies, failures = [], 0
+    deadline = time.perf_counter() + args.duration
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            nonlocal failures
+            while time.perf_counter() < deadline:
+                if random.random() < 0.5:
+                    url = "/api/clients"
+                else:
+                    url = f"/api/clients/{random.choice(account_ids)}/payments"
+                started = time.perf_counter()
+                response = await client.get(url)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    failures += 1
+
+        lags, stop = [], asyncio.Event()
+        probe = asyncio.create_task(probe_lag(args.probe_interval / 1000, lags, stop))
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        stop.set()
+        await probe
+
+    return {
+        "requests": len(latencies),
+        "failures": failures,
+        "req_per_s": round(len(latencies) / args.duration, 1),
+        "latency_ms": {"p50": round(percentile(latencies, 50), 2), "p95": round(percentile(latencies, 95), 2)},
+        "loop_lag_ms": {
+            "mean": round(statistics.fmean(lags), 2) if lags else 0.0,
+            "p50": round(percentile(lags, 50), 2),
+            "p99": round(percentile(lags, 99), 2),
+            "max": round(max(lags, default=0.0), 2),
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="default: temporary seeded SQLite file")
+    parser.add_argument("--no-seed", action="store_true", help="use the database as is")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--payments", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--probe-interval", type=float, default=5.0, help="ms between lag probes")
+    args = parser.parse_args()
+
+    if args.database_url is None:
+        args.database_url = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    if not args.no_seed:
+        if not args.database_url.startswith("sqlite"):
+            parser.error("--no-seed is required for non-SQLite databases")
+        seed_sqlite(args.database_url.split("///", 1)[1], args.clients, args.payments)
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("META_ACCESS_TOKEN", "bench")
+    # import-time DDL is Postgres-only and fails on SQLite; keep the report readable
+    logging.disable(logging.CRITICAL)
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Cold-start profile of main:app
+
+Reports, each measured in a fresh subprocess:
+  - import time per top-level module (`python -X importtime -c "import main"`)
+  - time from process start to the first 200 from /healthz under uvicorn
+  - RSS of the idle server once it is healthy
+
+    python bench/startup.py
+    python bench/startup.py --runs 5 --top 15 --json
+"""
+
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+backend_dir = Path(__file__).resolve().parent.parent
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)$")
+
+def import_profile(top: int, env: dict) -> dict:
+    """Cumulative import time of `main` and of the modules it imports directly or through routers."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=backend_dir, capture_output=True, text=True, env=env,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import main failed:\n{proc.stderr[-2000:]}")
+
+    # lines come in completion order: main's subtree is everything between the previous
+    # top-level entry (interpreter startup, e.g. site) and main itself
+    total_us, packages, subtree = 0, {}, {}
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        if len(indent) == 1:
+            if name == "main":
+                total_us, packages = int(cumulative), subtree
+                break
+            subtree = {}
+        elif "." not in name:
+            # top-level packages (e.g. "openai", "sqlalchemy"); a module is only imported once
+            subtree[name] = int(cumulative)
+    ranked = sorted(packages.items(), key=lambda item: -item[1])
+    return {
+        "import_main_ms": round(total_us / 1000, 1),
+        "top_modules_ms": {name: round(us / 1000, 1) for name, us in ranked[:top]},
+    }
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _rss_kb(pid: int):
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def child_env(database_path: Path) -> dict:
+    """Environment for the profiled process: the current one pointed at a throwaway SQLite database."""
+    return {**os.environ, "DATABASE_URL": f"sqlite:///{database_path}"}
+
+def boot_once(timeout: float, idle: float, env: dict) -> dict:
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=backend_dir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=env,
+    )
+    try:
+        healthy_at = None
+        while time.perf_counter() - started < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {proc.returncode}:\n{proc.stderr.read().decode()[-2000:]}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz", timeout=1) as response:
+                    if response.status == 200:
+                        healthy_at = time.perf_counter()
+                        break
+            except OSError:
+                time.sleep(0.01)
+        if healthy_at is None:
+            raise RuntimeError(f"/healthz not healthy after {timeout}s")
+        time.sleep(idle)
+        rss_kb = _rss_kb(proc.pid)
+        return {
+            "time_to_healthy_ms": round((healthy_at - started) * 1000, 1),
+            "idle_rss_mb": round(rss_kb / 1024, 1) if rss_kb is not None else None,
+        }
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start profile of main:app")
+    parser.add_argument("--runs", type=int, default=3, help="server boots to take the median over")
+    parser.add_argument("--top", type=int, default=10, help="modules to list by import time")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for /healthz")
+    parser.add_argument("--idle", type=float, default=1.0, help="seconds idle before sampling RSS")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    # every boot migrates a fresh database, so runs start equally cold and never touch the dev database
+    with tempfile.TemporaryDirectory() as tmp:
+        report = import_profile(args.top, child_env(Path(tmp) / "import.db"))
+        boots = [boot_once(args.timeout, args.idle, child_env(Path(tmp) / f"boot{run}.db")) for run in range(args.runs)]
+    healthy = [boot["time_to_healthy_ms"] for boot in boots]
+    rss = [boot["idle_rss_mb"] for boot in boots if boot["idle_rss_mb"] is not None]
+    report.update(
+        time_to_healthy_ms={"median": round(statistics.median(healthy), 1), "min": min(healthy), "max": max(healthy)},
+        idle_rss_mb=round(statistics.median(rss), 1) if rss else None,
+        runs=args.runs,
+    )
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"import main:        {report['import_main_ms']} ms")
+    for name, ms in report["top_modules_ms"].items():
+        print(f"  {name:<24}{ms:>8} ms")
+    print(f"time to /healthz:   {report['time_to_healthy_ms']['median']} ms (median of {args.runs}, "
+          f"min {report['time_to_healthy_ms']['min']}, max {report['time_to_healthy_ms']['max']})")
+    print(f"idle RSS:           {report['idle_rss_mb']} MB")
+
+if __name__ == "__main__":
+    main()
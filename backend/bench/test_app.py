@@ -0,0 +1,219 @@
+"""
+End-to-end checks of main:app against the fake Graph API and a throwaway SQLite database,
+covering the paths the load benchmark relies on: adsets caching and invalidation, the NDJSON stream and payment totals.
+
+    cd backend && python -m pytest -q bench/test_app.py
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import httpx
+import orjson
+
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from startup import free_port
+
+# core.config reads these at import time, so they are set before anything from the app is imported
+GRAPH_PORT = free_port()
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(tempfile.mkdtemp()) / 'test.db'}"
+os.environ["GRAPH_API_BASE_URL"] = f"http://127.0.0.1:{GRAPH_PORT}"
+os.environ["META_ACCESS_TOKEN"] = "test"
+os.environ["INSIGHTS_SYNC_ENABLED"] = "false"
+# a throttled account fails at once, and a partial result is never served from the cache
+os.environ["GRAPH_MAX_RETRIES"] = "0"
+os.environ["ADSETS_CACHE_PARTIAL_TTL"] = "0"
+
+from fake_graph import start_fake_graph
+import main
+from services import facebook_service, insights_warehouse, overview_service
+
+ACCOUNTS, ADSETS = 2, 3
+
+@asynccontextmanager
+async def running_app(**graph_options):
+    """(client, FakeGraph) for main:app with empty response caches."""
+    logging.disable(logging.CRITICAL)
+    facebook_service.adsets_cache.invalidate()
+    overview_service.overview_cache.invalidate()
+    runner, _, graph = await start_fake_graph(port=GRAPH_PORT, accounts=ACCOUNTS, adsets=ADSETS, ads=1, **graph_options)
+    try:
+        async with main.app.router.lifespan_context(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                yield client, graph
+    finally:
+        await runner.cleanup()
+        logging.disable(logging.NOTSET)
+
+def test_adsets_cache_hit_and_not_modified():
+    async def scenario():
+        async with running_app() as (client, _):
+            first = await client.get("/api/adsets", params={"date_preset": "last_7d"})
+            assert first.status_code == 200
+            assert first.headers["X-Cache"] == "MISS"
+            assert len(first.json()) == ACCOUNTS * ADSETS
+
+            second = await client.get("/api/adsets", params={"date_preset": "last_7d"})
+            assert second.headers["X-Cache"] == "HIT"
+            assert second.content == first.content
+
+            etag = second.headers["ETag"]
+            revalidated = await client.get("/api/adsets", params={"date_preset": "last_7d"}, headers={"If-None-Match": etag})
+            assert revalidated.status_code == 304
+            assert revalidated.content == b""
+
+    asyncio.run(scenario())
+
+def test_adsets_ndjson_trailer_fills_cache():
+    async def scenario():
+        async with running_app() as (client, _):
+            streamed = await client.get("/api/adsets", params={"date_preset": "last_7d", "stream": "ndjson"})
+            assert streamed.status_code == 200
+            lines = [orjson.loads(line) for line in streamed.content.splitlines()]
+            rows, trailer = lines[:-1], lines[-1]
+            assert all(row.get("type") != "trailer" for row in rows)
+            assert trailer["type"] == "trailer"
+            assert trailer["cache"] == "MISS"
+            assert trailer["errors"] == []
+            assert trailer["totals"]["accounts"] == ACCOUNTS
+            assert trailer["totals"]["adsets"] == len(rows) == ACCOUNTS * ADSETS
+            assert trailer["totals"]["spend"] == round(sum(row["spend"] for row in rows), 2)
+
+            # the streamed rows were stored for the JSON response
+            cached = await client.get("/api/adsets", params={"date_preset": "last_7d"})
+            assert cached.headers["X-Cache"] == "HIT"
+            assert sorted(row["adset_id"] for row in cached.json()) == sorted(row["adset_id"] for row in rows)
+
+    asyncio.run(scenario())
+
+def test_payment_totals_follow_payment_changes():
+    async def scenario():
+        async with running_app() as (client, _):
+            created = await client.post("/api/clients", json={
+                "account_id": "act_1", "account_name": "Client", "monthly_budget": 100,
+                "start_date": "2026-01-01", "monthly_payment_azn": 50,
+            })
+            assert created.status_code == 200
+
+            async def totals():
+                client_row = (await client.get("/api/clients/act_1")).json()
+                return client_row["total_paid"], client_row["last_payment_at"]
+
+            first = (await client.post("/api/clients/act_1/payments", json={"paid_at": "2026-02-01", "amount": 100})).json()
+            second = (await client.post("/api/clients/act_1/payments", json={"paid_at": "2026-03-01", "amount": 50})).json()
+            assert await totals() == (150, "2026-03-01")
+
+            updates = await asyncio.gather(*(
+                client.put(f"/api/clients/act_1/payments/{first['id']}", json={"amount": float(amount)})
+                for amount in range(10, 20)
+            ))
+            assert all(update.status_code == 200 for update in updates)
+            payments = (await client.get("/api/clients/act_1/payments")).json()
+            total_paid, _ = await totals()
+            assert total_paid == sum(payment["amount"] for payment in payments)
+
+            moved = await client.put(f"/api/clients/act_1/payments/{second['id']}", json={"paid_at": "2026-01-15"})
+            assert moved.status_code == 200
+            assert (await totals())[1] == "2026-02-01"
+
+            missing = await client.put("/api/clients/act_1/payments/999999", json={"amount": 1})
+            assert missing.status_code == 404
+
+            deleted = await client.delete(f"/api/clients/act_1/payments/{second['id']}")
+            assert deleted.status_code == 200
+            assert await totals() == (total_paid - 50, "2026-02-01")
+
+    asyncio.run(scenario())
+
+def test_partial_adsets_result_is_not_cached():
+    async def scenario():
+        async with running_app(throttled_accounts=(1,)) as (client, graph):
+            partial = await client.get("/api/adsets", params={"date_preset": "last_month"})
+            assert partial.status_code == 200
+            assert {row["account_name"] for row in partial.json()} == {"Fake Account 00"}
+            assert partial.headers["X-Account-Errors"]
+
+            # once the account recovers it is back on the next request, not after the range's 6 h TTL
+            graph.throttled_accounts.clear()
+            recovered = await client.get("/api/adsets", params={"date_preset": "last_month"})
+            assert recovered.headers["X-Cache"] == "MISS"
+            assert "X-Account-Errors" not in recovered.headers
+            assert len(recovered.json()) == ACCOUNTS * ADSETS
+
+            cached = await client.get("/api/adsets", params={"date_preset": "last_month"})
+            assert cached.headers["X-Cache"] == "HIT"
+
+    asyncio.run(scenario())
+
+def test_partial_ndjson_stream_is_not_cached():
+    async def scenario():
+        async with running_app(throttled_accounts=(1,)) as (client, graph):
+            streamed = await client.get("/api/adsets", params={"date_preset": "last_month", "stream": "ndjson"})
+            trailer = orjson.loads(streamed.content.splitlines()[-1])
+            assert [error["account_name"] for error in trailer["errors"]] == ["Fake Account 01"]
+
+            graph.throttled_accounts.clear()
+            recovered = await client.get("/api/adsets", params={"date_preset": "last_month", "stream": "ndjson"})
+            trailer = orjson.loads(recovered.content.splitlines()[-1])
+            assert trailer["cache"] == "MISS"
+            assert trailer["errors"] == []
+            assert trailer["totals"]["accounts"] == ACCOUNTS
+
+    asyncio.run(scenario())
+
+def test_status_update_drops_cached_adsets():
+    async def scenario():
+        async with running_app() as (client, _):
+            rows = (await client.get("/api/adsets", params={"date_preset": "last_7d"})).json()
+            assert (await client.get("/api/adsets", params={"date_preset": "last_7d"})).headers["X-Cache"] == "HIT"
+
+            updated = await client.post(f"/api/adsets/{rows[0]['adset_id']}/update-status", json={"status": "PAUSED"})
+            assert updated.status_code == 200
+            assert (await client.get("/api/adsets", params={"date_preset": "last_7d"})).headers["X-Cache"] == "MISS"
+
+    asyncio.run(scenario())
+
+def test_timed_out_batch_sub_request_is_fetched_directly():
+    async def scenario():
+        async with running_app() as (client, graph):
+            adset_id = (await client.get("/api/adsets", params={"date_preset": "last_7d"})).json()[0]["adset_id"]
+            expected = await client.get(f"/api/adsets/{adset_id}/ads", params={"date_preset": "maximum"})
+            assert expected.status_code == 200
+
+            graph.batch_timeout_edges.add("insights")
+            ads = await client.get(f"/api/adsets/{adset_id}/ads", params={"date_preset": "maximum"})
+            assert ads.status_code == 200
+            assert graph.stats["batch_timeouts"] >= 1
+            assert ads.json() == expected.json()
+
+    asyncio.run(scenario())
+
+def test_insights_sync_runs_once_per_interval():
+    async def scenario():
+        async with running_app() as (_, graph):
+            session = await facebook_service.get_http_session()
+            stored = await insights_warehouse.sync_pass(session)
+            assert stored is not None and set(stored) and all(rows > 0 for rows in stored.values())
+
+            # another worker's timer firing right after the pass finds it done and skips
+            calls = graph.stats["http_requests"]
+            assert await insights_warehouse.sync_pass(session) is None
+            assert graph.stats["http_requests"] == calls
+
+    asyncio.run(scenario())
+
+def test_sync_engine_has_its_own_small_pool():
+    from core import config, database
+
+    pools = database.pool_metrics()
+    assert (pools["sync"]["size"], pools["sync"]["max_overflow"]) == (config.DB_SYNC_POOL_SIZE, config.DB_SYNC_MAX_OVERFLOW)
+    assert (pools["async"]["size"], pools["async"]["max_overflow"]) == (config.DB_POOL_SIZE, config.DB_MAX_OVERFLOW)
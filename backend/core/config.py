@@ -17,8 +17,85 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 # --- Facebook API Constants ---
 API_VERSION = "v19.0"
+# Базовый адрес Graph API; для бенчмарков и тестов без токена — локальная заглушка (bench/fake_graph.py)
+GRAPH_API_BASE_URL = os.getenv("GRAPH_API_BASE_URL", "https://graph.facebook.com").rstrip("/")
+GRAPH_API_URL = f"{GRAPH_API_BASE_URL}/{API_VERSION}"
 LEAD_ACTION_TYPE = "onsite_conversion.messaging_conversation_started_7d"
 
+# Что считаем лидом. У клиента в clients.lead_action_types — список через запятую из имён пресетов
+# и/или конкретных action_type; пусто — DEFAULT_LEAD_DEFINITION.
+LEAD_DEFINITION_PRESETS = {
+    "messaging": [LEAD_ACTION_TYPE],
+    "lead_forms": ["onsite_conversion.lead_grouped"],
+    "pixel": ["offsite_conversion.fb_pixel_lead"],
+}
+DEFAULT_LEAD_DEFINITION = os.getenv("DEFAULT_LEAD_DEFINITION", "messaging")
+LEAD_DEFINITIONS_REFRESH = float(os.getenv("LEAD_DEFINITIONS_REFRESH", "60"))  # seconds
+
+# Сколько рекламных аккаунтов обрабатываем параллельно в /api/adsets
+ACCOUNT_FETCH_CONCURRENCY = int(os.getenv("ACCOUNT_FETCH_CONCURRENCY", "8"))
+
+# --- Shared HTTP client (aiohttp connection pool to the Graph API host) ---
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "50"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_REQUEST_TIMEOUT = float(os.getenv("HTTP_REQUEST_TIMEOUT", "120"))
+
+# --- Graph API batch requests (до 50 относительных запросов в одном POST) ---
+GRAPH_BATCH_ENABLED = os.getenv("GRAPH_BATCH_ENABLED", "true").lower() in ("1", "true", "yes")
+GRAPH_BATCH_WINDOW_MS = float(os.getenv("GRAPH_BATCH_WINDOW_MS", "15"))
+GRAPH_BATCH_MAX_SIZE = min(int(os.getenv("GRAPH_BATCH_MAX_SIZE", "50")), 50)
+
+# --- In-process cache for /api/adsets (TTL в секундах по date_preset) ---
+ADSETS_CACHE_TTLS = {
+    "today": 60,
+    "yesterday": 30 * 60,
+    "last_3d": 5 * 60,
+    "last_7d": 5 * 60,
+    "last_14d": 10 * 60,
+    "last_30d": 10 * 60,
+    "this_month": 5 * 60,
+    "last_month": 6 * 60 * 60,
+    "maximum": 10 * 60,
+}
+ADSETS_CACHE_DEFAULT_TTL = int(os.getenv("ADSETS_CACHE_DEFAULT_TTL", "300"))
+ADSETS_CACHE_CLOSED_RANGE_TTL = int(os.getenv("ADSETS_CACHE_CLOSED_RANGE_TTL", str(6 * 60 * 60)))
+ADSETS_CACHE_STALE_TTL = int(os.getenv("ADSETS_CACHE_STALE_TTL", "600"))
+# результат, где часть аккаунтов не загрузилась, держим недолго и не отдаём как STALE
+ADSETS_CACHE_PARTIAL_TTL = int(os.getenv("ADSETS_CACHE_PARTIAL_TTL", str(ADSETS_CACHE_TTLS["today"])))
+ADSETS_CACHE_MAX_BYTES = int(os.getenv("ADSETS_CACHE_MAX_MB", "64")) * 1024 * 1024
+TIME_INSIGHTS_CACHE_MAX_BYTES = int(os.getenv("TIME_INSIGHTS_CACHE_MAX_MB", "16")) * 1024 * 1024
+OVERVIEW_CACHE_MAX_BYTES = int(os.getenv("OVERVIEW_CACHE_MAX_MB", "8")) * 1024 * 1024
+
+# --- Graph API rate limiting (по X-App-Usage / X-Ad-Account-Usage / X-Business-Use-Case-Usage) ---
+# темп ниже usage SLOWDOWN_PCT не ограничиваем; выше — не больше RATE запросов/сек на владельца (аккаунт/бизнес/app)
+GRAPH_RATE_PER_ACCOUNT = float(os.getenv("GRAPH_RATE_PER_ACCOUNT", "10"))   # запросов/сек на аккаунт
+GRAPH_BURST_PER_ACCOUNT = float(os.getenv("GRAPH_BURST_PER_ACCOUNT", "20"))
+GRAPH_USAGE_SLOWDOWN_PCT = float(os.getenv("GRAPH_USAGE_SLOWDOWN_PCT", "75"))
+GRAPH_USAGE_PAUSE_PCT = float(os.getenv("GRAPH_USAGE_PAUSE_PCT", "95"))
+GRAPH_MAX_RETRIES = int(os.getenv("GRAPH_MAX_RETRIES", "4"))
+GRAPH_BACKOFF_BASE = float(os.getenv("GRAPH_BACKOFF_BASE", "2"))
+GRAPH_BACKOFF_MAX = float(os.getenv("GRAPH_BACKOFF_MAX", "60"))
+
+# --- Async Insights report runs (POST act_X/insights -> report_run_id -> poll -> page) ---
+INSIGHTS_ASYNC_ENABLED = os.getenv("INSIGHTS_ASYNC_ENABLED", "true").lower() in ("1", "true", "yes")
+INSIGHTS_ASYNC_MIN_DAYS = int(os.getenv("INSIGHTS_ASYNC_MIN_DAYS", "90"))
+INSIGHTS_ASYNC_MIN_ROWS = int(os.getenv("INSIGHTS_ASYNC_MIN_ROWS", "20000"))
+INSIGHTS_ASYNC_POLL_INTERVAL = float(os.getenv("INSIGHTS_ASYNC_POLL_INTERVAL", "2"))
+INSIGHTS_ASYNC_TIMEOUT = float(os.getenv("INSIGHTS_ASYNC_TIMEOUT", "600"))
+
+# Локальное хранилище дневных инсайтов: фоновая синхронизация, из Meta перезапрашиваем только окно атрибуции
+INSIGHTS_SYNC_ENABLED = os.getenv("INSIGHTS_SYNC_ENABLED", "false").lower() in ("1", "true", "yes")
+INSIGHTS_SYNC_INTERVAL = float(os.getenv("INSIGHTS_SYNC_INTERVAL", "3600"))  # seconds
+INSIGHTS_MUTABLE_DAYS = int(os.getenv("INSIGHTS_MUTABLE_DAYS", "28"))
+INSIGHTS_WAREHOUSE_START_DATE = os.getenv("INSIGHTS_WAREHOUSE_START_DATE", "2025-06-01")
+
+# --- Сжатие ответов (brotli если установлен brotli-asgi, иначе gzip) ---
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # bytes
+GZIP_COMPRESS_LEVEL = int(os.getenv("GZIP_COMPRESS_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
 FRONTEND_ORIGINS = [
     "https://ad-dash.pages.dev",      # прод Cloudflare Pages
     "https://ads-dash.pages.dev",     # если используешь этот тоже
@@ -50,6 +127,21 @@ DATABASE_URL = (
     os.getenv("POSTGRES_PRIVATE_URL") or
     "sqlite:///./ad_dash.db"  # fallback to SQLite
 )
+
+# --- Пулы соединений (общие для всех роутеров, см. core/database.py) ---
+# На воркер максимум DB_POOL_SIZE + DB_MAX_OVERFLOW + DB_SYNC_POOL_SIZE + DB_SYNC_MAX_OVERFLOW
+# соединений (по умолчанию 5 + 10 + 2 + 0 = 17); умножьте на число воркеров и сверьте с max_connections.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))  # async_engine: обработчики запросов
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# sync engine: auth/settings, lead definitions, overview, склад инсайтов и миграции — нагрузка небольшая
+DB_SYNC_POOL_SIZE = int(os.getenv("DB_SYNC_POOL_SIZE", "2"))
+DB_SYNC_MAX_OVERFLOW = int(os.getenv("DB_SYNC_MAX_OVERFLOW", "0"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))  # Postgres statement_timeout, 0 = off
+# Миграции схемы при старте (под advisory lock — выполняет один воркер). В проде лучше false + `python manage.py migrate` в release-шаге
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "K6787326###1gHjTrA") # Замени на сложный ключ
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRE_MINUTES = 60 * 24 # 24 часа
@@ -0,0 +1,141 @@
+# backend/core/database.py
+
+import logging
+import threading
+import time
+from typing import Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import URL, Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from core.config import (
+    DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_SYNC_POOL_SIZE, DB_SYNC_MAX_OVERFLOW,
+    DB_POOL_RECYCLE, DB_POOL_TIMEOUT, DB_STATEMENT_TIMEOUT_MS,
+)
+
+# The process's database engines, shared by every router and service: `engine` (sync, for
+# threadpool routes, DDL and background jobs) and `async_engine` (request handlers, so DB round
+# trips don't block the event loop the Graph API fetches run on). The sync engine only serves the
+# few threadpool readers left, so it gets a small pool of its own (DB_SYNC_POOL_SIZE, no overflow by
+# default); see core/config.py for the per-worker connection total.
+
+class PoolWaitStats:
+    """Time spent waiting for a connection from the pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+
+    def info(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "wait_total_s": round(self.total_wait, 4),
+            "wait_avg_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "wait_max_ms": round(self.max_wait * 1000, 3),
+        }
+
+class TimedQueuePool(QueuePool):
+    wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_stats.record(time.perf_counter() - started)
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_stats.record(time.perf_counter() - started)
+
+def _pool_args(url: URL, poolclass, pool_size: int, max_overflow: int) -> dict:
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # in-memory SQLite needs its single-connection pool
+        return {}
+    return dict(
+        poolclass=poolclass, pool_size=pool_size, max_overflow=max_overflow,
+        pool_recycle=DB_POOL_RECYCLE, pool_timeout=DB_POOL_TIMEOUT,
+    )
+
+def database_url(database_url: str) -> Tuple[URL, dict]:
+    """DATABASE_URL -> sync (psycopg2) URL + connect_args, with sslmode=require and the statement timeout."""
+    url = make_url(database_url)
+    connect_args = {}
+    if url.drivername.startswith("postgres"):
+        if url.drivername in ("postgres", "postgresql"):
+            # requirements ставят psycopg2; SQLAlchemy 2.1 по умолчанию ищет psycopg 3
+            url = url.set(drivername="postgresql+psycopg2")
+        if "sslmode" not in url.query:
+            connect_args["sslmode"] = "require"
+        if DB_STATEMENT_TIMEOUT_MS:
+            connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    return url, connect_args
+
+def async_database_url(database_url: str) -> Tuple[URL, dict]:
+    """DATABASE_URL (sync driver) -> the same database on its async driver, plus connect_args."""
+    url = make_url(database_url)
+    connect_args = {}
+    if url.drivername.startswith("postgres"):
+        # asyncpg не понимает sslmode в URL — передаём как ssl
+        sslmode = url.query.get("sslmode", "require")
+        url = url.set(drivername="postgresql+asyncpg").difference_update_query(["sslmode"])
+        connect_args["ssl"] = sslmode
+        if DB_STATEMENT_TIMEOUT_MS:
+            connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+    elif url.drivername.startswith("sqlite"):
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url, connect_args
+
+def create_sync_engine(url_string: str = DATABASE_URL) -> Engine:
+    url, connect_args = database_url(url_string)
+    logging.info(f"Creating DB engine for {url.render_as_string(hide_password=True)}")
+    return create_engine(url, pool_pre_ping=True, connect_args=connect_args, **_pool_args(url, TimedQueuePool, DB_SYNC_POOL_SIZE, DB_SYNC_MAX_OVERFLOW))
+
+def create_db_engine(url_string: str = DATABASE_URL) -> AsyncEngine:
+    url, connect_args = async_database_url(url_string)
+    logging.info(f"Creating async DB engine for {url.render_as_string(hide_password=True)}")
+    return create_async_engine(url, pool_pre_ping=True, connect_args=connect_args, **_pool_args(url, TimedAsyncQueuePool, DB_POOL_SIZE, DB_MAX_OVERFLOW))
+
+engine = create_sync_engine()
+async_engine = create_db_engine()
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def _pool_info(pool) -> dict:
+    info = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        info.update(
+            size=pool.size(), checked_out=pool.checkedout(), checked_in=pool.checkedin(),
+            overflow=max(0, pool.overflow()), max_overflow=pool._max_overflow,
+        )
+    wait_stats = getattr(pool, "wait_stats", None)
+    if wait_stats is not None:
+        info.update(wait_stats.info())
+    return info
+
+def pool_metrics() -> dict:
+    """Checked-out connections, overflow in use and checkout wait time for both engines."""
+    return {"sync": _pool_info(engine.pool), "async": _pool_info(async_engine.sync_engine.pool)}
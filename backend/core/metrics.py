@@ -0,0 +1,225 @@
+# backend/core/metrics.py
+
+import contextvars
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# In-process Prometheus metrics, rendered by GET /metrics in the text exposition format.
+# observe() is a bisect and two dict updates with no locking: almost everything runs on the event
+# loop, and a sync-engine statement racing it from a worker thread can at worst lose one sample.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (non-cumulative, last = +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str]):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in sorted(self._values.items()))
+        return lines
+
+class GaugeCallback:
+    """Gauge read at scrape time: fn() returns {label values: value}."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], fn: Callable[[], Dict[Tuple[str, ...], float]]):
+        self.name, self.help, self.labelnames, self.fn = name, help, tuple(labelnames), fn
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        lines.extend(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in sorted(self.fn().items()))
+        return lines
+
+REGISTRY: list = []
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+http_request_duration = register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template (until the last body chunk is sent).",
+    ["method", "route", "status"],
+))
+graph_request_duration = register(Histogram(
+    "graph_request_duration_seconds", "Graph API call latency per attempt, including reading the body.",
+    ["edge", "method", "status"],
+))
+graph_requests = register(Counter(
+    "graph_requests_total", "Graph API calls per attempt; error_code is Meta's error.code, empty on success.",
+    ["edge", "status", "error_code"],
+))
+graph_response_size = register(Histogram(
+    "graph_response_size_bytes", "Graph API response body size.", ["edge"], buckets=SIZE_BUCKETS,
+))
+graph_batch_responses = register(Counter(
+    "graph_batch_responses_total", "Sub-responses of Graph batch requests (the POST itself is edge=\"batch\" above).",
+    ["edge", "status", "error_code"],
+))
+db_query_duration = register(Histogram(
+    "db_query_duration_seconds", "Database statement latency by the route that issued it ('none' outside requests).",
+    ["route", "engine"], buckets=DB_BUCKETS,
+))
+
+# --- HTTP ---
+
+# ASGI scope of the request being handled; routing fills scope["route"] before the handler runs,
+# so statements can be attributed to the route template without threading it through the code.
+_current_scope: contextvars.ContextVar[Optional[Scope]] = contextvars.ContextVar("metrics_scope", default=None)
+
+# id(route) -> router prefix missing from route.path
+_route_prefixes: Dict[int, str] = {}
+
+def route_template(scope: Optional[Scope]) -> str:
+    if scope is None:
+        return "none"
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        # unmatched paths share one label so scanners can't blow up the series count
+        return "unmatched"
+    prefix = _route_prefixes.get(id(route))
+    if prefix is None:
+        # newer FastAPI keeps included routers nested, so route.path lacks the include_router prefix:
+        # it is the part of the request path in front of what the route's own pattern matches
+        path, prefix = scope["path"], ""
+        if not route.path_regex.match(path):
+            for index in (i for i, char in enumerate(path) if char == "/" and i > 0):
+                if route.path_regex.match(path[index:]):
+                    prefix = path[:index]
+                    break
+        _route_prefixes[id(route)] = prefix
+    return prefix + template
+
+class MetricsMiddleware:
+    """Records http_request_duration_seconds by route template. Pure ASGI; add it last so it is the outermost layer."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        token = _current_scope.set(scope)
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current_scope.reset(token)
+            http_request_duration.observe(
+                (scope["method"], route_template(scope), str(status)), time.perf_counter() - started,
+            )
+
+# --- Graph API ---
+
+GRAPH_EDGES = {"adsets", "insights", "ads", "adactivity", "adaccounts", "campaigns", "adcreatives"}
+
+def graph_edge(method: str, url: str) -> str:
+    """Low-cardinality edge label for a Graph URL: adsets/insights/ads/adactivity/..., object, batch or ids."""
+    segments = [s for s in urlsplit(url).path.split("/") if s]
+    if segments and segments[0].startswith("v") and "." in segments[0]:
+        segments = segments[1:]
+    if not segments:
+        return "batch" if method.lower() == "post" else "ids"
+    edge = "adactivity" if segments[-1] == "activities" else segments[-1]
+    if edge in GRAPH_EDGES:
+        return edge
+    return "object" if len(segments) == 1 else "other"
+
+def observe_graph_request(method: str, url: str, status: str, error_code: str, size: int, seconds: float) -> None:
+    edge = graph_edge(method, url)
+    graph_request_duration.observe((edge, method.upper(), status), seconds)
+    graph_requests.inc((edge, status, error_code))
+    if size:
+        graph_response_size.observe((edge,), size)
+
+def observe_graph_batch_response(relative_url: str, status: str, error_code: str) -> None:
+    graph_batch_responses.inc((graph_edge("get", relative_url), status, error_code))
+
+# --- Database ---
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """Time every statement on `engine` (for an AsyncEngine pass .sync_engine) into db_query_duration_seconds."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_query_start"].pop()
+        db_query_duration.observe((route_template(_current_scope.get()), name), time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("metrics_query_start"):
+            started = conn.info["metrics_query_start"].pop()
+            db_query_duration.observe((route_template(_current_scope.get()), name), time.perf_counter() - started)
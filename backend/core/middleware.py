@@ -0,0 +1,128 @@
+# backend/core/middleware.py
+
+import hashlib
+import json
+import logging
+import re
+from typing import Any, List, Optional, Pattern, Tuple
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.config import COMPRESSION_MIN_SIZE, GZIP_COMPRESS_LEVEL, BROTLI_QUALITY
+
+try:
+    import orjson
+except ImportError:  # orjson is optional: fall back to the stdlib encoder
+    orjson = None
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+def json_dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson. Returning it directly from a route also skips jsonable_encoder."""
+
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
+
+def add_compression(app: FastAPI) -> None:
+    """Compress responses above COMPRESSION_MIN_SIZE, negotiated through Accept-Encoding (br, then gzip)."""
+    if BrotliMiddleware is not None:
+        app.add_middleware(
+            BrotliMiddleware, quality=BROTLI_QUALITY, minimum_size=COMPRESSION_MIN_SIZE, gzip_fallback=True,
+        )
+        logging.info("Response compression: brotli (gzip fallback)")
+    else:
+        app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE, compresslevel=GZIP_COMPRESS_LEVEL)
+        logging.info("Response compression: gzip")
+
+# Routes answered with an ETag, and their Cache-Control. "no-cache" = the browser may keep the body
+# but must revalidate it (If-None-Match) every time.
+ETAG_ROUTES: List[Tuple[str, str]] = [
+    (r"^/api/adsets/[^/]+/(stats|time-insights)$", "private, max-age=60"),
+    (r"^/api/adsets(/[^/]+)?$", "private, no-cache"),
+    (r"^/api/clients(/.*)?$", "private, no-cache"),
+    (r"^/api/overview/clients$", "private, no-cache"),
+]
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+class ETagMiddleware:
+    """
+    Strong ETag (hash of the body) for GET responses on ETAG_ROUTES; If-None-Match hits get an empty 304.
+    Pure ASGI so it sees the uncompressed body: add it before add_compression() so compression wraps it.
+    Streaming responses and non-200 responses pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, routes: List[Tuple[str, str]] = ETAG_ROUTES):
+        self.app = app
+        self.routes: List[Tuple[Pattern, str]] = [(re.compile(pattern), cache_control) for pattern, cache_control in routes]
+
+    def cache_control(self, path: str) -> Optional[str]:
+        for pattern, cache_control in self.routes:
+            if pattern.match(path):
+                return cache_control
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        cache_control = self.cache_control(scope["path"]) if scope["type"] == "http" and scope["method"] == "GET" else None
+        if cache_control is None:
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        start: Optional[Message] = None
+        chunks: List[bytes] = []
+        passthrough = False
+
+        async def send_with_etag(message: Message) -> None:
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            more_body = message.get("more_body", False)
+            if start["status"] != 200 or (more_body and not chunks):
+                # ошибки и стриминг (NDJSON) не буферизуем
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if more_body:
+                return
+
+            body = b"".join(chunks)
+            etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+            headers = MutableHeaders(raw=start["headers"])
+            headers["ETag"] = etag
+            if "cache-control" not in headers:
+                headers["Cache-Control"] = cache_control
+            if if_none_match and _etag_matches(if_none_match, etag):
+                del headers["content-length"]
+                del headers["content-type"]
+                await send({**start, "status": 304})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_with_etag)
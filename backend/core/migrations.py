@@ -0,0 +1,236 @@
+# backend/core/migrations.py
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from core.database import engine
+
+# Schema migrations, applied in order and recorded in schema_version. Run by `python manage.py migrate`
+# (release step) or from the app lifespan when MIGRATE_ON_STARTUP is on; importing modules does no DDL.
+# Applied migrations are never edited — schema changes go into a new entry at the end.
+
+# pg_advisory_xact_lock key: with several workers starting at once, one migrates and the rest wait
+# for it and then find nothing pending.
+MIGRATION_LOCK_KEY = 0x61645F6461  # "ad_da"
+
+SCHEMA_VERSION_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# (version, name, {dialect: [statements]}); "*" = same SQL for PostgreSQL and SQLite.
+# 1-7 reproduce the tables the app used to create at import time, so they are no-ops on existing databases.
+MIGRATIONS: List[Tuple[int, str, Dict[str, List[str]]]] = [
+    (1, "users", {
+        "postgresql": ["""
+            CREATE TABLE IF NOT EXISTS users (
+                id SERIAL PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                email VARCHAR(255) UNIQUE NOT NULL,
+                hashed_password VARCHAR(255) NOT NULL,
+                is_active BOOLEAN DEFAULT TRUE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """, "CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)"],
+        "sqlite": ["""
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                email TEXT UNIQUE NOT NULL,
+                hashed_password TEXT NOT NULL,
+                is_active BOOLEAN DEFAULT 1,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """, "CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)"],
+    }),
+    (2, "clients", {
+        "postgresql": ["""
+            CREATE TABLE IF NOT EXISTS clients (
+                id SERIAL PRIMARY KEY,
+                account_id TEXT UNIQUE NOT NULL,
+                account_name TEXT NOT NULL,
+                avatar_url TEXT,
+                monthly_budget NUMERIC(18,2) NOT NULL DEFAULT 0,
+                start_date DATE NOT NULL,
+                monthly_payment_azn NUMERIC(18,2) NOT NULL DEFAULT 0,
+                created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+                updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+            )
+        """, "CREATE INDEX IF NOT EXISTS idx_clients_account_id ON clients(account_id)", """
+            CREATE OR REPLACE FUNCTION set_clients_updated_at()
+            RETURNS TRIGGER AS $$
+            BEGIN
+                NEW.updated_at = NOW();
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql
+        """, "DROP TRIGGER IF EXISTS trg_clients_updated_at ON clients", """
+            CREATE TRIGGER trg_clients_updated_at
+            BEFORE UPDATE ON clients
+            FOR EACH ROW
+            EXECUTE FUNCTION set_clients_updated_at()
+        """],
+        "sqlite": ["""
+            CREATE TABLE IF NOT EXISTS clients (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                account_id TEXT UNIQUE NOT NULL,
+                account_name TEXT NOT NULL,
+                avatar_url TEXT,
+                monthly_budget NUMERIC(18,2) NOT NULL DEFAULT 0,
+                start_date DATE NOT NULL,
+                monthly_payment_azn NUMERIC(18,2) NOT NULL DEFAULT 0,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """, "CREATE INDEX IF NOT EXISTS idx_clients_account_id ON clients(account_id)", """
+            CREATE TRIGGER IF NOT EXISTS trg_clients_updated_at
+            AFTER UPDATE ON clients
+            FOR EACH ROW WHEN NEW.updated_at = OLD.updated_at
+            BEGIN
+                UPDATE clients SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+            END
+        """],
+    }),
+    (3, "client_payments", {
+        "postgresql": ["""
+            CREATE TABLE IF NOT EXISTS client_payments (
+                id SERIAL PRIMARY KEY,
+                client_id INTEGER REFERENCES clients(id) ON DELETE CASCADE,
+                paid_at DATE NOT NULL,
+                amount NUMERIC(18,2) NOT NULL,
+                note TEXT,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+            )
+        """, "CREATE INDEX IF NOT EXISTS idx_client_payments_client_id ON client_payments(client_id)"],
+        "sqlite": ["""
+            CREATE TABLE IF NOT EXISTS client_payments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                client_id INTEGER REFERENCES clients(id) ON DELETE CASCADE,
+                paid_at DATE NOT NULL,
+                amount NUMERIC(18,2) NOT NULL,
+                note TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """, "CREATE INDEX IF NOT EXISTS idx_client_payments_client_id ON client_payments(client_id)"],
+    }),
+    # пресеты/типы действий, которые считаем лидами для этого аккаунта (см. LEAD_DEFINITION_PRESETS)
+    (4, "clients_lead_action_types", {
+        "postgresql": ["ALTER TABLE clients ADD COLUMN IF NOT EXISTS lead_action_types TEXT"],
+        "sqlite": ["ALTER TABLE clients ADD COLUMN lead_action_types TEXT"],
+    }),
+    (5, "client_payment_totals", {
+        "postgresql": ["""
+            CREATE TABLE IF NOT EXISTS client_payment_totals (
+                client_id INTEGER PRIMARY KEY REFERENCES clients(id) ON DELETE CASCADE,
+                total_paid NUMERIC(18,2) NOT NULL DEFAULT 0,
+                last_payment_at DATE,
+                updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+            )
+        """],
+        "sqlite": ["""
+            CREATE TABLE IF NOT EXISTS client_payment_totals (
+                client_id INTEGER PRIMARY KEY REFERENCES clients(id) ON DELETE CASCADE,
+                total_paid NUMERIC(18,2) NOT NULL DEFAULT 0,
+                last_payment_at DATE,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """],
+        "*": ["DELETE FROM client_payment_totals", """
+            INSERT INTO client_payment_totals (client_id, total_paid, last_payment_at)
+            SELECT client_id, SUM(amount), MAX(paid_at)
+            FROM client_payments
+            WHERE client_id IS NOT NULL
+            GROUP BY client_id
+        """],
+    }),
+    (6, "insights_warehouse", {
+        "*": ["""
+            CREATE TABLE IF NOT EXISTS insights_daily (
+                level TEXT NOT NULL,
+                object_id TEXT NOT NULL,
+                account_id TEXT NOT NULL,
+                adset_id TEXT,
+                date_start DATE NOT NULL,
+                spend DOUBLE PRECISION NOT NULL DEFAULT 0,
+                impressions BIGINT NOT NULL DEFAULT 0,
+                clicks BIGINT NOT NULL DEFAULT 0,
+                inline_link_clicks BIGINT NOT NULL DEFAULT 0,
+                cpm DOUBLE PRECISION NOT NULL DEFAULT 0,
+                ctr DOUBLE PRECISION NOT NULL DEFAULT 0,
+                frequency DOUBLE PRECISION NOT NULL DEFAULT 0,
+                actions TEXT,
+                synced_at TIMESTAMP NOT NULL,
+                PRIMARY KEY (level, object_id, date_start)
+            )
+        """, "CREATE INDEX IF NOT EXISTS idx_insights_daily_adset ON insights_daily(adset_id, level, date_start)", """
+            CREATE TABLE IF NOT EXISTS insights_sync_state (
+                account_id TEXT PRIMARY KEY,
+                last_synced_date DATE NOT NULL,
+                synced_at TIMESTAMP NOT NULL
+            )
+        """],
+    }),
+    (7, "avatar_settings", {
+        "postgresql": ["""
+            CREATE TABLE IF NOT EXISTS avatar_settings (
+                id SERIAL PRIMARY KEY,
+                account_id VARCHAR NOT NULL,
+                image_url VARCHAR NOT NULL
+            )
+        """],
+        "sqlite": ["""
+            CREATE TABLE IF NOT EXISTS avatar_settings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                account_id VARCHAR NOT NULL,
+                image_url VARCHAR NOT NULL
+            )
+        """],
+        "*": [
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_avatar_settings_account_id ON avatar_settings(account_id)",
+            "CREATE INDEX IF NOT EXISTS ix_avatar_settings_id ON avatar_settings(id)",
+        ],
+    }),
+]
+
+def _statements(migration: Dict[str, List[str]], dialect: str) -> List[str]:
+    return migration.get(dialect, []) + migration.get("*", [])
+
+def run_migrations(bind: Optional[Engine] = None) -> List[int]:
+    """Apply pending migrations in one transaction. Returns the versions applied by this call."""
+    bind = bind or engine
+    dialect = bind.dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        raise RuntimeError(f"Migrations are not defined for the {dialect} dialect")
+
+    applied_now = []
+    with bind.begin() as conn:
+        if dialect == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        conn.execute(text(SCHEMA_VERSION_SQL))
+        applied = set(conn.execute(text("SELECT version FROM schema_version")).scalars())
+        for version, name, migration in MIGRATIONS:
+            if version in applied:
+                continue
+            logging.info(f"Applying migration {version}: {name}")
+            for sql in _statements(migration, dialect):
+                conn.execute(text(sql))
+            conn.execute(
+                text("INSERT INTO schema_version (version, name) VALUES (:version, :name)"),
+                {"version": version, "name": name},
+            )
+            applied_now.append(version)
+    if applied_now:
+        logging.info(f"Schema migrated to version {applied_now[-1]}")
+    return applied_now
+
+def current_version(bind: Optional[Engine] = None) -> int:
+    with (bind or engine).connect() as conn:
+        return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
@@ -1,12 +1,52 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI, Response, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from api.endpoints import router as api_router
 from api.auth_endpoints import router as auth_router
 from api.user_endpoints import router as user_router
 from api.clients_endpoints import router as clients_router
+from api.overview_endpoints import router as overview_router
+from core import database, metrics, migrations
+from core.config import MIGRATE_ON_STARTUP
+from core.database import async_engine
+from core.middleware import ETagMiddleware, FastJSONResponse, add_compression
+from services import facebook_service, insights_warehouse
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if MIGRATE_ON_STARTUP:
+        try:
+            await asyncio.to_thread(migrations.run_migrations)
+        except Exception as e:
+            # не роняем приложение: БД может быть временно недоступна
+            logging.error(f"Schema migration failed: {e}", exc_info=True)
+    # Один пул соединений к Graph API на весь процесс
+    session = await facebook_service.open_http_session()
+    sync_task = insights_warehouse.start_background_sync(session)
+    try:
+        yield
+    finally:
+        if sync_task:
+            sync_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await sync_task
+        await facebook_service.close_http_session()
+        await async_engine.dispose()
+
+app = FastAPI(
+    title="Ad-Dash Backend API", version="1.0.0", lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
 
-app = FastAPI(title="Ad-Dash Backend API", version="1.0.0")
+# ETag/304 считается по несжатому телу, поэтому добавляется раньше сжатия (сжатие — внешний слой)
+app.add_middleware(ETagMiddleware)
+# gzip/brotli для больших JSON (adsets, stats, time-insights)
+add_compression(app)
 
 # ⛳️ ВРЕМЕННО: максимально широкие CORS (cookies НЕ используем)
 app.add_middleware(
@@ -15,8 +55,18 @@ app.add_middleware(
     allow_credentials=False,     # ВАЖНО: выключено
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Account-Errors", "X-Cache", "Age", "ETag"],
 )
 
+# Гистограммы запросов по шаблону маршрута — самый внешний слой, чтобы учитывать и сжатие, и CORS
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(async_engine.sync_engine, "async")
+metrics.instrument_engine(database.engine, "sync")
+metrics.register(metrics.GaugeCallback(
+    "db_pool_checked_out_connections", "Connections currently checked out of the pool.", ["engine"],
+    lambda: {(name,): info.get("checked_out", 0) for name, info in database.pool_metrics().items()},
+))
+
 # Ловим preflight на ВСЕ пути (иногда роутер не даёт 200/204 на OPTIONS)
 @app.options("/{full_path:path}")
 def preflight_all(full_path: str):
@@ -36,6 +86,7 @@ app.include_router(auth_router, prefix="/auth")
 app.include_router(user_router, prefix="/users")
 app.include_router(api_router,  prefix="/api")
 app.include_router(clients_router, prefix="/api")
+app.include_router(overview_router, prefix="/api")
 
 @app.get("/")
 def read_root():
@@ -44,3 +95,7 @@ def read_root():
 @app.get("/healthz")
 def healthz():
     return {"ok": True}
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Maintenance commands for Ad-Dash Backend
+
+    python manage.py migrate
+    python manage.py rebuild-payment-totals
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+def migrate(args):
+    """Apply pending schema migrations"""
+    from core import migrations
+
+    applied = migrations.run_migrations()
+    version = migrations.current_version()
+    if applied:
+        print(f"✅ Applied migrations {applied}, schema version {version}")
+    else:
+        print(f"✅ Schema is up to date (version {version})")
+
+def rebuild_payment_totals(args):
+    """Recompute client_payment_totals from client_payments"""
+    from api.clients_endpoints import rebuild_payment_totals as rebuild
+
+    count = rebuild()
+    print(f"✅ Payment totals rebuilt for {count} clients")
+
+COMMANDS = {
+    "migrate": migrate,
+    "rebuild-payment-totals": rebuild_payment_totals,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Ad-Dash maintenance commands")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    COMMANDS[args.command](args)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,16 @@
 # backend/models/payloads.py
 
 from pydantic import BaseModel
-from typing import Dict
+from typing import Dict, List, Optional
 
 class AdSetPayload(BaseModel):
     adset: dict
 
 class StatusUpdatePayload(BaseModel):
     status: str
+
+class BulkAdsPayload(BaseModel):
+    adset_ids: List[str]
+    date_preset: str = "last_7d"
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
@@ -1,6 +1,5 @@
 # backend/services/ai_service.py
 
-import openai
 import json
 import logging
 import asyncio
@@ -12,6 +11,16 @@ from core.config import OPENAI_API_KEY
 from services.facebook_service import build_ads_payload
 from utils.helpers import safe_float
 
+_openai_client = None
+
+def get_openai_client():
+    """Shared AsyncOpenAI client; `openai` is imported on first use so it stays out of app startup."""
+    global _openai_client
+    if _openai_client is None:
+        import openai
+        _openai_client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY)
+    return _openai_client
+
 async def get_ai_analysis(adsets: List[dict]) -> Dict:
     if not OPENAI_API_KEY:
         raise HTTPException(status_code=500, detail="OpenAI API key is not configured.")
@@ -55,7 +64,7 @@ Ensure your entire response is a single, valid JSON.
     user_data = {"total_spend": total_spend, "total_leads": total_leads, "adsets_sample": simplified_adsets}
 
     try:
-        client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY)
+        client = get_openai_client()
         response = await client.chat.completions.create(
             model="gpt-4o", response_format={"type": "json_object"},
             messages=[
@@ -69,19 +78,18 @@ Ensure your entire response is a single, valid JSON.
         logging.error(f"OpenAI API error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to get AI analysis: {e}")
 
-async def get_ai_detailed_analysis(adset_info: dict) -> Dict:
+async def get_ai_detailed_analysis(session: aiohttp.ClientSession, adset_info: dict) -> Dict:
     if not OPENAI_API_KEY: raise HTTPException(status_code=500, detail="OpenAI API key not configured.")
     adset_id = adset_info.get("adset_id")
     if not adset_id: raise HTTPException(status_code=400, detail="Adset ID is missing in the payload.")
     
     ads_today, ads_yesterday, ads_maximum = [], [], []
-    async with aiohttp.ClientSession() as session:
-        results = await asyncio.gather(
-            build_ads_payload(session, adset_id, "today"),
-            build_ads_payload(session, adset_id, "yesterday"),
-            build_ads_payload(session, adset_id, "maximum"),
-            return_exceptions=True
-        )
+    results = await asyncio.gather(
+        build_ads_payload(session, adset_id, "today"),
+        build_ads_payload(session, adset_id, "yesterday"),
+        build_ads_payload(session, adset_id, "maximum"),
+        return_exceptions=True
+    )
     
     if isinstance(results[0], list): ads_today = results[0]
     else: logging.warning(f"Could not fetch 'today' data for {adset_id}: {results[0]}")
@@ -111,7 +119,7 @@ You are a meticulous performance marketing specialist analyzing trend data for a
 Ensure your entire response is a single, valid JSON.
 """
     try:
-        client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY)
+        client = get_openai_client()
         response = await client.chat.completions.create(model="gpt-4o", response_format={"type":"json_object"}, messages=[{"role":"system","content":system_prompt}, {"role":"user","content":json.dumps(data_for_ai,ensure_ascii=False)}], temperature=0.5, max_tokens=2000)
         return json.loads(response.choices[0].message.content)
     except Exception as e:
@@ -0,0 +1,126 @@
+# backend/services/cache.py
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+TtlFor = Callable[[Any], Tuple[float, float]]
+
+class _Entry:
+    __slots__ = ("value", "size", "created_at", "ttl", "stale_ttl")
+
+    def __init__(self, value: Any, size: int, ttl: float, stale_ttl: float):
+        self.value = value
+        self.size = size
+        self.created_at = time.monotonic()
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+
+    def age(self) -> float:
+        return time.monotonic() - self.created_at
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory footprint of a JSON-like value (its serialized length)."""
+    try:
+        return len(json.dumps(value, default=str, separators=(",", ":")))
+    except (TypeError, ValueError):
+        return 0
+
+class ResponseCache:
+    """
+    In-process cache with per-entry TTL, LRU eviction bounded by total size, and stale-while-revalidate.
+
+    A fresh entry is returned as HIT. Past its TTL (but within `stale_ttl`) it is returned as STALE
+    and a single background task reloads it. Concurrent misses for one key share a single load.
+    `ttl_for(value)` may return (ttl, stale_ttl) for a loaded value, e.g. to keep partial results briefly.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int = 512):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._loading: Dict[Hashable, asyncio.Task] = {}
+        self._bytes = 0
+        self.stats = {"hit": 0, "stale": 0, "miss": 0, "evicted": 0}
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: float, stale_ttl: float = 0,
+                          ttl_for: Optional[TtlFor] = None) -> Tuple[Any, str, int]:
+        """Return (value, "HIT" | "STALE" | "MISS", age in seconds)."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = entry.age()
+            if age < entry.ttl:
+                self._entries.move_to_end(key)
+                self.stats["hit"] += 1
+                return entry.value, "HIT", int(age)
+            if age < entry.ttl + entry.stale_ttl:
+                self._entries.move_to_end(key)
+                self.stats["stale"] += 1
+                self._start_load(key, loader, ttl, stale_ttl, ttl_for)
+                return entry.value, "STALE", int(age)
+            self._remove(key)
+
+        self.stats["miss"] += 1
+        value = await asyncio.shield(self._start_load(key, loader, ttl, stale_ttl, ttl_for))
+        return value, "MISS", 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry.age() >= entry.ttl + entry.stale_ttl:
+            return None
+        return entry.value
+
+    def set(self, key: Hashable, value: Any, ttl: float, stale_ttl: float = 0) -> None:
+        self._remove(key)
+        entry = _Entry(value, estimate_size(value), ttl, stale_ttl)
+        if entry.size > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats["evicted"] += 1
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        if key is None:
+            self._entries.clear()
+            self._bytes = 0
+        else:
+            self._remove(key)
+
+    def info(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes, **self.stats}
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _start_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: float, stale_ttl: float,
+                    ttl_for: Optional[TtlFor]) -> asyncio.Task:
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader, ttl, stale_ttl, ttl_for))
+            # background refreshes may have no awaiter; mark their exceptions as retrieved
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._loading[key] = task
+        return task
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: float, stale_ttl: float,
+                    ttl_for: Optional[TtlFor]) -> Any:
+        try:
+            value = await loader()
+            if ttl_for is not None:
+                ttl, stale_ttl = ttl_for(value)
+            self.set(key, value, ttl, stale_ttl)
+            return value
+        except Exception as e:
+            # a failed background refresh keeps serving the stale value
+            logging.warning(f"Cache load failed for {key}: {e}")
+            raise
+        finally:
+            self._loading.pop(key, None)
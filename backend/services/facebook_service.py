@@ -3,75 +3,429 @@
 import aiohttp
 import json
 import asyncio
-from datetime import datetime
-from typing import List, Optional, Dict
+import logging
+import time
+from datetime import datetime, date
+from typing import Any, AsyncIterator, Awaitable, Callable, FrozenSet, List, Optional, Dict, Set, Tuple
+from urllib.parse import urlencode
 
-from core.config import META_TOKEN, API_VERSION, LEAD_ACTION_TYPE
-from utils.helpers import safe_float, resolve_avatar_url
+from fastapi import HTTPException
+
+from core.config import (
+    META_TOKEN, GRAPH_API_BASE_URL, GRAPH_API_URL, ACCOUNT_FETCH_CONCURRENCY,
+    HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST, HTTP_KEEPALIVE_TIMEOUT, HTTP_DNS_CACHE_TTL, HTTP_REQUEST_TIMEOUT,
+    GRAPH_BATCH_ENABLED, GRAPH_BATCH_WINDOW_MS, GRAPH_BATCH_MAX_SIZE,
+    ADSETS_CACHE_TTLS, ADSETS_CACHE_DEFAULT_TTL, ADSETS_CACHE_CLOSED_RANGE_TTL, ADSETS_CACHE_STALE_TTL, ADSETS_CACHE_PARTIAL_TTL, ADSETS_CACHE_MAX_BYTES,
+    GRAPH_MAX_RETRIES,
+    INSIGHTS_ASYNC_ENABLED, INSIGHTS_ASYNC_MIN_DAYS, INSIGHTS_ASYNC_MIN_ROWS, INSIGHTS_ASYNC_POLL_INTERVAL, INSIGHTS_ASYNC_TIMEOUT,
+)
+from core import metrics
+from services.cache import ResponseCache
+from services.graph_throttle import graph_throttle, THROTTLE_ERROR_CODES, backoff_delay, usage_key
+from services import lead_definitions
+from services.insights_normalizer import normalize_insights, as_lists
+from utils.helpers import resolve_avatar_url
+
+# Application-scoped session: opened in the FastAPI lifespan hook, shared by all requests
+_http_session: Optional[aiohttp.ClientSession] = None
+
+def create_http_session() -> aiohttp.ClientSession:
+    """Create a ClientSession with a keep-alive connection pool tuned for the Graph API host."""
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=HTTP_REQUEST_TIMEOUT))
+
+async def open_http_session() -> aiohttp.ClientSession:
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = create_http_session()
+    return _http_session
+
+async def close_http_session() -> None:
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """FastAPI dependency returning the shared session (opened lazily if the lifespan hook did not run)."""
+    return await open_http_session()
+
+# Single-flight: identical concurrent GETs share one in-flight request
+_inflight: Dict[str, asyncio.Future] = {}
+graph_request_stats = {"issued": 0, "coalesced": 0}
+
+def request_key(method: str, url: str, params: Optional[dict] = None) -> str:
+    items = sorted((k, str(v)) for k, v in (params or {}).items() if k != "access_token")
+    return f"{method.upper()} {url}?{urlencode(items)}"
+
+async def single_flight(key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Run factory() once for all concurrent callers with the same key.
+    Callers share the same result object, so they must treat it as read-only.
+    """
+    task = _inflight.get(key)
+    if task is not None:
+        graph_request_stats["coalesced"] += 1
+        return await asyncio.shield(task)
+    graph_request_stats["issued"] += 1
+    task = asyncio.ensure_future(factory())
+    _inflight[key] = task
+
+    def done(t: asyncio.Future) -> None:
+        if _inflight.get(key) is t:
+            del _inflight[key]
+        if not t.cancelled():
+            t.exception()  # mark as retrieved even if every caller went away
+
+    task.add_done_callback(done)
+    # shield: one caller being cancelled must not cancel the request for the others
+    return await asyncio.shield(task)
 
 async def fb_request(session: aiohttp.ClientSession, method: str, url: str, params: dict = None, data: dict = None):
     """A generic helper for making requests to the Facebook Graph API."""
     if params is None: params = {}
-    params["access_token"] = META_TOKEN
+    # paging.next URLs from Graph already carry the token in their query string
+    if "access_token=" not in url:
+        params["access_token"] = META_TOKEN
     
     if not META_TOKEN:
         raise Exception("Meta access token is not configured")
-    
-    async with session.request(method, url, params=params, json=data) as response:
-        if response.status == 400:
-            error_data = await response.json()
-            if "error" in error_data:
-                error_msg = error_data["error"].get("message", "Unknown Facebook API error")
-                if "expired" in error_msg.lower() or "invalid" in error_msg.lower():
-                    raise Exception(f"Facebook API token expired or invalid: {error_msg}")
-                else:
-                    raise Exception(f"Facebook API error: {error_msg}")
-        
-        response.raise_for_status()
-        return await response.json()
+
+    send = lambda: with_throttle_retries(url, lambda: _send_request(session, method, url, params, data))
+    if method.lower() != "get":
+        graph_request_stats["issued"] += 1
+        return await send()
+    return await single_flight(request_key(method, url, params), send)
+
+async def with_throttle_retries(url: str, factory: Callable[[], Awaitable[Any]], batched: bool = False) -> Any:
+    """
+    Dispatch through the usage scheduler; retry throttling errors (codes 4/17/32/613/800xx)
+    with jittered exponential backoff, pausing the owner's bucket meanwhile.
+    `batched` requests ride in a batch POST that is paced itself, so they only wait out pauses.
+    """
+    for attempt in range(GRAPH_MAX_RETRIES + 1):
+        if batched:
+            await graph_throttle.wait_paused(url)
+        else:
+            await graph_throttle.acquire(url)
+        try:
+            return await factory()
+        except GraphAPIError as e:
+            if e.code not in THROTTLE_ERROR_CODES or attempt == GRAPH_MAX_RETRIES:
+                raise
+            delay = backoff_delay(attempt)
+            graph_throttle.throttled(url, delay)
+            logging.warning(f"Graph API throttled (code {e.code}) on {usage_key(url)}, retry {attempt + 1} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+async def _send_request(session: aiohttp.ClientSession, method: str, url: str, params: dict, data: Optional[dict]):
+    started = time.perf_counter()
+    status, error_code, size = "exception", "", 0
+    try:
+        async with session.request(method, url, params=params, json=data) as response:
+            status = str(response.status)
+            graph_throttle.record_headers(url, response.headers)
+            size = len(await response.read())
+            if response.status >= 400:
+                try:
+                    error_data = await response.json(content_type=None)
+                except ValueError:
+                    error_data = None
+                if isinstance(error_data, dict) and "error" in error_data:
+                    error = graph_error(error_data)
+                    error_code = str(error.code or "")
+                    raise error
+
+            response.raise_for_status()
+            return await response.json()
+    finally:
+        metrics.observe_graph_request(method, url, status, error_code, size, time.perf_counter() - started)
+
+class GraphAPIError(Exception):
+    """Error payload returned by the Graph API; keeps Meta's error code for retry decisions."""
+
+    def __init__(self, message: str, code: Optional[int] = None, subcode: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+        self.subcode = subcode
+
+def graph_error(error_data: dict) -> GraphAPIError:
+    """Build the exception raised for a Graph API error payload ({"error": {...}})."""
+    error = error_data.get("error") or {}
+    error_msg = error.get("message", "Unknown Facebook API error")
+    code, subcode = error.get("code"), error.get("error_subcode")
+    if "expired" in error_msg.lower() or "invalid" in error_msg.lower():
+        return GraphAPIError(f"Facebook API token expired or invalid: {error_msg}", code, subcode)
+    return GraphAPIError(f"Facebook API error: {error_msg}", code, subcode)
+
+class GraphBatcher:
+    """
+    Groups relative GET requests into Graph API batch POSTs (POST to GRAPH_API_BASE_URL with `batch`).
+    A batch is flushed when it reaches `max_size` requests or `window` seconds after its first request;
+    each caller awaits its own future and gets back the decoded body of its own sub-response.
+    """
+
+    def __init__(self, window: float, max_size: int = 50):
+        self.window = window
+        self.max_size = max_size
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # the loop only keeps weak references to tasks: hold in-flight batches until they finish
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def get(self, session: aiohttp.ClientSession, relative_url: str) -> dict:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(({"method": "GET", "relative_url": relative_url}, future))
+        self._session = session
+        if len(self._pending) >= self.max_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self.flush)
+        return await future
+
+    def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if pending:
+            task = asyncio.ensure_future(self._send(self._session, pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, session: aiohttp.ClientSession, pending: List[Tuple[dict, asyncio.Future]]) -> None:
+        try:
+            responses = await fb_request(
+                session, "post", f"{GRAPH_API_BASE_URL}/",
+                data={"batch": [req for req, _ in pending], "include_headers": False},
+            )
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        if not isinstance(responses, list):
+            responses = []
+        timed_out = []
+        for index, (req, future) in enumerate(pending):
+            if future.done():  # caller went away
+                continue
+            resp = responses[index] if index < len(responses) else None
+            if not isinstance(resp, dict):
+                # Meta returns null for sub-requests that did not finish within the batch timeout;
+                # those are fetched on their own below, so callers see the same result as unbatched
+                metrics.observe_graph_batch_response(req["relative_url"], "timeout", "")
+                timed_out.append((req, future))
+                continue
+            try:
+                body = json.loads(resp.get("body") or "{}")
+            except ValueError:
+                body = {}
+            error_code = ""
+            if resp.get("code") == 200:
+                future.set_result(body)
+            elif isinstance(body, dict) and "error" in body:
+                error = graph_error(body)
+                error_code = str(error.code or "")
+                future.set_exception(error)
+            else:
+                future.set_exception(Exception(f"Facebook API error: HTTP {resp.get('code')}"))
+            metrics.observe_graph_batch_response(req["relative_url"], str(resp.get("code")), error_code)
+        if timed_out:
+            await asyncio.gather(*(self._send_direct(session, req, future) for req, future in timed_out))
+
+    async def _send_direct(self, session: aiohttp.ClientSession, req: dict, future: asyncio.Future) -> None:
+        try:
+            result = await fb_request(session, "get", f"{GRAPH_API_BASE_URL}/{req['relative_url']}")
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+_batcher = GraphBatcher(window=GRAPH_BATCH_WINDOW_MS / 1000.0, max_size=GRAPH_BATCH_MAX_SIZE)
+
+async def fb_batched_get(session: aiohttp.ClientSession, url: str, params: dict = None) -> dict:
+    """GET through the batching layer; falls back to a direct request for non-Graph URLs or when disabled."""
+    prefix = f"{GRAPH_API_BASE_URL}/"
+    if not GRAPH_BATCH_ENABLED or not url.startswith(prefix):
+        return await fb_request(session, "get", url, params=params)
+    if not META_TOKEN:
+        raise Exception("Meta access token is not configured")
+    relative_url = url[len(prefix):]
+    if params:
+        relative_url = f"{relative_url}?{urlencode(params)}"
+    return await single_flight(
+        f"BATCH {relative_url}", lambda: with_throttle_retries(url, lambda: _batcher.get(session, relative_url), batched=True)
+    )
+
+async def iter_paginated(session: aiohttp.ClientSession, url: str, params: dict = None, max_rows: Optional[int] = None, batch: bool = False) -> AsyncIterator[dict]:
+    """
+    Yield rows of a Graph API list edge, following `paging.next` cursors lazily.
+    Only one page is held in memory at a time; iteration stops after `max_rows` rows if given.
+    With `batch=True` the first page goes through the batching layer (later pages are fetched directly).
+    """
+    yielded = 0
+    next_url, next_params = url, params
+    first_page = True
+    while next_url:
+        if first_page and batch:
+            page = await fb_batched_get(session, next_url, params=next_params)
+        else:
+            page = await fb_request(session, "get", next_url, params=next_params)
+        first_page = False
+        for row in page.get("data", []) or []:
+            yield row
+            yielded += 1
+            if max_rows is not None and yielded >= max_rows:
+                return
+        # the next URL already contains all query params, including the cursor
+        next_url, next_params = (page.get("paging") or {}).get("next"), None
+
+async def fetch_all_pages(session: aiohttp.ClientSession, url: str, params: dict = None, max_rows: Optional[int] = None, batch: bool = False) -> List[dict]:
+    return [row async for row in iter_paginated(session, url, params=params, max_rows=max_rows, batch=batch)]
+
+# Approximate number of days covered by each date_preset (None = open-ended)
+PRESET_DAYS = {
+    "today": 1, "yesterday": 1, "last_3d": 3, "last_7d": 7, "last_14d": 14, "last_28d": 28,
+    "last_30d": 30, "last_90d": 90, "this_month": 31, "last_month": 31, "this_quarter": 92,
+    "last_quarter": 92, "this_year": 366, "last_year": 366, "maximum": None,
+}
+
+def insights_range_days(params: dict) -> Optional[int]:
+    time_range = params.get("time_range")
+    if time_range:
+        try:
+            bounds = json.loads(time_range) if isinstance(time_range, str) else time_range
+            since, until = date.fromisoformat(bounds["since"]), date.fromisoformat(bounds["until"])
+            return (until - since).days + 1
+        except (ValueError, KeyError, TypeError):
+            return None
+    return PRESET_DAYS.get(params.get("date_preset"))
+
+def should_run_async_report(url: str, params: dict, object_count: int = 1) -> bool:
+    """
+    Account-level queries over a known range of INSIGHTS_ASYNC_MIN_DAYS+ days, or with a large row estimate
+    (objects x days for daily breakdowns), go through async report runs. Per-object queries and open-ended
+    ranges (maximum, unknown presets) stay synchronous: polling costs at least one poll interval.
+    """
+    if not INSIGHTS_ASYNC_ENABLED or "/act_" not in url:
+        return False
+    days = insights_range_days(params)
+    if days is None:
+        return False
+    rows = object_count * (days if str(params.get("time_increment")) == "1" else 1)
+    return days >= INSIGHTS_ASYNC_MIN_DAYS or rows >= INSIGHTS_ASYNC_MIN_ROWS
+
+async def iter_async_insights(session: aiohttp.ClientSession, url: str, params: dict, max_rows: Optional[int] = None) -> AsyncIterator[dict]:
+    """
+    Run an insights query as an async report: POST the query to the insights edge, poll the
+    returned report_run_id until the job completes, then page its results.
+    Polling sleeps between checks, so many reports can be in flight without holding request slots.
+    """
+    query = {k: v for k, v in params.items() if k != "limit"}
+    run = await fb_request(session, "post", url, data=query)
+    report_run_id = run.get("report_run_id")
+    if not report_run_id:
+        raise GraphAPIError(f"Facebook API error: no report_run_id in async insights response: {run}")
+
+    report_url = f"{GRAPH_API_URL}/{report_run_id}"
+    deadline = asyncio.get_running_loop().time() + INSIGHTS_ASYNC_TIMEOUT
+    delay = INSIGHTS_ASYNC_POLL_INTERVAL
+    while True:
+        status = await fb_request(session, "get", report_url, params={"fields": "async_status,async_percent_completion"})
+        async_status = status.get("async_status")
+        if async_status == "Job Completed":
+            break
+        if async_status in ("Job Failed", "Job Skipped"):
+            raise GraphAPIError(f"Facebook API error: async insights report {report_run_id} {async_status.lower()}")
+        if asyncio.get_running_loop().time() > deadline:
+            raise GraphAPIError(f"Facebook API error: async insights report {report_run_id} timed out at {status.get('async_percent_completion')}%")
+        await asyncio.sleep(delay)
+        delay = min(delay * 1.5, 30)
+
+    async for row in iter_paginated(session, f"{report_url}/insights", params={"limit": params.get("limit", 500)}, max_rows=max_rows):
+        yield row
+
+async def iter_insights(session: aiohttp.ClientSession, url: str, params: dict, object_count: int = 1, max_rows: Optional[int] = None) -> AsyncIterator[dict]:
+    """Insights rows for `url`, fetched synchronously or through an async report run depending on size."""
+    if should_run_async_report(url, params, object_count):
+        rows = iter_async_insights(session, url, params, max_rows=max_rows)
+    else:
+        rows = iter_paginated(session, url, params=params, max_rows=max_rows)
+    async for row in rows:
+        yield row
+
+async def fetch_insights(session: aiohttp.ClientSession, url: str, params: dict, object_count: int = 1, max_rows: Optional[int] = None) -> List[dict]:
+    return [row async for row in iter_insights(session, url, params, object_count=object_count, max_rows=max_rows)]
 
 async def get_ad_accounts(session: aiohttp.ClientSession) -> List[dict]:
-    url = f"https://graph.facebook.com/{API_VERSION}/me/adaccounts"
-    params = {"fields": "name,account_id"}
-    return (await fb_request(session, "get", url, params=params)).get("data", []) or []
+    url = f"{GRAPH_API_URL}/me/adaccounts"
+    params = {"fields": "name,account_id", "limit": 500}
+    return await fetch_all_pages(session, url, params=params)
 
 async def get_all_adsets_from_account(session: aiohttp.ClientSession, account_id: str) -> List[dict]:
-    url = f"https://graph.facebook.com/{API_VERSION}/act_{account_id}/adsets"
+    url = f"{GRAPH_API_URL}/act_{account_id}/adsets"
     params = {"fields": "id,name,campaign{name,objective},effective_status", "limit": 500}
-    return (await fb_request(session, "get", url, params=params)).get("data", []) or []
+    return await fetch_all_pages(session, url, params=params)
 
 async def get_insights_for_adsets(session: aiohttp.ClientSession, account_id: str, adset_ids: list, date_preset: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[dict]:
-    url = f"https://graph.facebook.com/{API_VERSION}/act_{account_id}/insights"
-    filtering_object = [{"field": "adset.id", "operator": "IN", "value": adset_ids}]
+    url = f"{GRAPH_API_URL}/act_{account_id}/insights"
     params = {
         "level": "adset",
         "fields": "adset_id,spend,actions,cpm,ctr,clicks,impressions,frequency,inline_link_clicks",
-        "filtering": json.dumps(filtering_object, separators=(',', ':')),
+        "filtering": adset_filter(adset_ids),
         "limit": 5000
     }
+    apply_insights_time_range(params, date_preset, start_date, end_date)
+    return await fetch_insights(session, url, params, object_count=len(adset_ids))
+
+def apply_insights_time_range(params: dict, date_preset: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> dict:
+    """Add time_range / date_preset to insights params (shared by all insights edges)."""
     if start_date and end_date:
         params["time_range"] = f'{{"since":"{start_date}","until":"{end_date}"}}'
     else:
         params["date_preset"] = date_preset if date_preset != "maximum" else 'last_7d'
         if date_preset == "maximum":
              params["time_range"] = f'{{"since":"2025-06-01","until":"{datetime.now().strftime("%Y-%m-%d")}"}}'
-    return (await fb_request(session, "get", url, params=params)).get("data", []) or []
+    return params
+
+def adset_filter(adset_ids: List[str]) -> str:
+    return json.dumps([{"field": "adset.id", "operator": "IN", "value": adset_ids}], separators=(',', ':'))
 
 async def get_ads_metadata(session: aiohttp.ClientSession, adset_id: str) -> List[dict]:
-    url = f"https://graph.facebook.com/{API_VERSION}/{adset_id}/ads"
+    url = f"{GRAPH_API_URL}/{adset_id}/ads"
     params = {"fields": "id,name,status,effective_status,creative{thumbnail_url,image_url}", "limit": 200}
-    return (await fb_request(session, "get", url, params=params)).get("data", []) or []
+    return await fetch_all_pages(session, url, params=params, batch=True)
 
 async def get_ads_insights(session: aiohttp.ClientSession, adset_id: str, date_preset: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[dict]:
-    url = f"https://graph.facebook.com/{API_VERSION}/{adset_id}/insights"
-    params = {"level": "ad", "fields": "ad_id,spend,impressions,clicks,inline_link_clicks,ctr,cpm,frequency,actions", "limit": 5000}
-    if start_date and end_date:
-        params["time_range"] = f'{{"since":"{start_date}","until":"{end_date}"}}'
-    else:
-        params["date_preset"] = date_preset if date_preset != "maximum" else 'last_7d'
-        if date_preset == "maximum":
-             params["time_range"] = f'{{"since":"2025-06-01","until":"{datetime.now().strftime("%Y-%m-%d")}"}}'
-    return (await fb_request(session, "get", url, params=params)).get("data", []) or []
+    url = f"{GRAPH_API_URL}/{adset_id}/insights"
+    params = {"level": "ad", "fields": "ad_id,account_id,spend,impressions,clicks,inline_link_clicks,ctr,cpm,frequency,actions", "limit": 5000}
+    apply_insights_time_range(params, date_preset, start_date, end_date)
+    return await fetch_all_pages(session, url, params=params, batch=True)
+
+def build_ad_items(ads: List[dict], insights: List[dict], lead_types: Optional[FrozenSet[str]] = None) -> List[dict]:
+    """Dashboard ad rows: ads metadata joined with their insights rows (same order, {} if missing)."""
+    cols = as_lists(normalize_insights(insights, lead_types))
+    return [
+        {
+            "ad_id": ad.get("id"), "ad_name": ad.get("name"), "status": ad.get("status") or ad.get("effective_status"),
+            "thumbnail_url": (ad.get("creative") or {}).get("thumbnail_url") or (ad.get("creative") or {}).get("image_url"),
+            "spend": cols["spend"][i], "impressions": cols["impressions"][i], "link_clicks": cols["link_clicks"][i],
+            "leads": cols["leads"][i], "cpa": cols["cpl"][i], "ctr_link": cols["ctr_link"][i],
+            "ctr": cols["ctr"][i], "cpm": cols["cpm"][i], "frequency": cols["frequency"][i], "clicks": cols["clicks"][i],
+        }
+        for i, ad in enumerate(ads)
+    ]
 
 async def build_ads_payload(session: aiohttp.ClientSession, adset_id: str, date_preset: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[dict]:
     ads_meta, ads_insights = await asyncio.gather(
@@ -79,70 +433,222 @@ async def build_ads_payload(session: aiohttp.ClientSession, adset_id: str, date_
         get_ads_insights(session, adset_id, date_preset, start_date, end_date)
     )
     ins_map = {row.get("ad_id"): row for row in ads_insights if row.get("ad_id")}
-    items = []
-    for ad in ads_meta:
-        ins = ins_map.get(ad.get("id"), {})
-        spend = safe_float(ins.get("spend", 0))
-        impressions = int(safe_float(ins.get("impressions", 0)))
-        link_clicks = int(safe_float(ins.get("inline_link_clicks", 0)))
-        leads = sum(int(safe_float(a.get("value", 0))) for a in ins.get("actions", []) or [] if LEAD_ACTION_TYPE in a.get("action_type", ""))
-        items.append({
-            "ad_id": ad.get("id"), "ad_name": ad.get("name"), "status": ad.get("status") or ad.get("effective_status"),
-            "thumbnail_url": (ad.get("creative") or {}).get("thumbnail_url") or (ad.get("creative") or {}).get("image_url"),
-            "spend": spend, "impressions": impressions, "link_clicks": link_clicks, "leads": leads,
-            "cpa": (spend / leads) if leads else 0.0,
-            "ctr_link": (link_clicks / impressions * 100.0) if impressions else 0.0,
-            "ctr": safe_float(ins.get("ctr", 0)), "cpm": safe_float(ins.get("cpm", 0)),
-            "frequency": safe_float(ins.get("frequency", 0)), "clicks": int(safe_float(ins.get("clicks", 0)))
-        })
-    return items
-
-async def fetch_and_process_all_adsets(date_preset: str, start_date: Optional[str], end_date: Optional[str]) -> List[dict]:
-    """Orchestrator function to get all adset data from all accounts."""
-    async with aiohttp.ClientSession() as session:
-        accounts = await get_ad_accounts(session)
-        if not accounts: return []
-        
-        all_data = []
-        for acc in accounts:
-            acc_name, acc_id = acc.get("name"), acc.get("account_id")
-            if not acc_id: continue
-            
-            adsets = await get_all_adsets_from_account(session, acc_id)
-            if not adsets: continue
-            
-            insights = await get_insights_for_adsets(session, acc_id, [a["id"] for a in adsets], date_preset, start_date, end_date)
-            insights_map = {row["adset_id"]: row for row in insights}
-
-            for adset in adsets:
-                ins = insights_map.get(adset["id"])
-                if not ins: continue
-                
-                spend = safe_float(ins.get("spend", 0))
-                leads = sum(int(safe_float(a.get("value", 0))) for a in ins.get("actions", []) or [] if LEAD_ACTION_TYPE in a.get("action_type", ""))
-                
-                all_data.append({
-                    "account_id": acc_id, "account_name": acc_name, "avatarUrl": resolve_avatar_url(acc_id, acc_name),
-                    "adset_id": adset["id"], "adset_name": adset.get("name"),
-                    "campaign_name": (adset.get("campaign") or {}).get("name"),
-                    "status": adset.get("effective_status"),
-                    "objective": (adset.get("campaign") or {}).get("objective", "N/A"),
-                    "spend": spend, "leads": leads, "cpl": (spend / leads) if leads > 0 else 0.0,
-                    "cpm": safe_float(ins.get("cpm", 0)), "ctr_all": safe_float(ins.get("ctr", 0)),
-                    "link_clicks": int(safe_float(ins.get("inline_link_clicks", 0))),
-                    "impressions": int(safe_float(ins.get("impressions", 0))),
-                    "frequency": safe_float(ins.get("frequency", 0))
-                })
-        return all_data
-
-async def update_entity_status(entity_id: str, new_status: str) -> dict:
+    lead_types = await lead_definitions.lead_types_for_account(ads_insights[0].get("account_id")) if ads_insights else None
+    return build_ad_items(ads_meta, [ins_map.get(ad.get("id"), {}) for ad in ads_meta], lead_types)
+
+async def get_active_ads_count(session: aiohttp.ClientSession, account_id: str) -> int:
+    """Number of ads with effective_status ACTIVE in an ad account (summary only, no ads listed)."""
+    url = f"{GRAPH_API_URL}/act_{account_id}/ads"
+    params = {"fields": "id", "effective_status": '["ACTIVE"]', "summary": "total_count", "limit": 1}
+    result = await fb_batched_get(session, url, params=params)
+    return int(((result or {}).get("summary") or {}).get("total_count") or 0)
+
+async def get_adset_account_ids(session: aiohttp.ClientSession, adset_ids: List[str]) -> Dict[str, str]:
+    """Resolve adset_id -> account_id with `?ids=` lookups (50 ids per request)."""
+    url = f"{GRAPH_API_URL}/"
+    chunks = [adset_ids[i:i + 50] for i in range(0, len(adset_ids), 50)]
+    results = await asyncio.gather(*(
+        fb_request(session, "get", url, params={"ids": ",".join(chunk), "fields": "account_id"}) for chunk in chunks
+    ))
+    account_ids = {}
+    for result in results:
+        for adset_id, obj in (result or {}).items():
+            if isinstance(obj, dict) and obj.get("account_id"):
+                account_ids[adset_id] = obj["account_id"]
+    return account_ids
+
+async def get_account_ads_metadata(session: aiohttp.ClientSession, account_id: str, adset_ids: List[str]) -> List[dict]:
+    url = f"{GRAPH_API_URL}/act_{account_id}/ads"
+    params = {
+        "fields": "id,name,status,effective_status,adset_id,creative{thumbnail_url,image_url}",
+        "filtering": adset_filter(adset_ids),
+        "limit": 500,
+    }
+    return await fetch_all_pages(session, url, params=params)
+
+async def get_account_ads_insights(session: aiohttp.ClientSession, account_id: str, adset_ids: List[str], date_preset: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[dict]:
+    url = f"{GRAPH_API_URL}/act_{account_id}/insights"
+    params = {
+        "level": "ad",
+        "fields": "ad_id,adset_id,spend,impressions,clicks,inline_link_clicks,ctr,cpm,frequency,actions",
+        "filtering": adset_filter(adset_ids),
+        "limit": 5000,
+    }
+    apply_insights_time_range(params, date_preset, start_date, end_date)
+    return await fetch_insights(session, url, params, object_count=len(adset_ids))
+
+async def build_bulk_ads_payload(session: aiohttp.ClientSession, adset_ids: List[str], date_preset: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict[str, List[dict]]:
+    """
+    Ads for many adsets at once, grouped by adset_id.
+    Per ad account this is one ads-metadata query and one `insights?level=ad` query filtered
+    by `adset.id IN (...)`, instead of two calls per adset as in build_ads_payload.
+    """
+    adset_ids = list(dict.fromkeys(adset_ids))
+    grouped: Dict[str, List[dict]] = {adset_id: [] for adset_id in adset_ids}
+    if not adset_ids:
+        return grouped
+
+    by_account: Dict[str, List[str]] = {}
+    for adset_id, account_id in (await get_adset_account_ids(session, adset_ids)).items():
+        by_account.setdefault(account_id, []).append(adset_id)
+
+    async def load(account_id: str, ids: List[str]):
+        return await asyncio.gather(
+            get_account_ads_metadata(session, account_id, ids),
+            get_account_ads_insights(session, account_id, ids, date_preset, start_date, end_date),
+        )
+
+    results = await asyncio.gather(*(load(account_id, ids) for account_id, ids in by_account.items()))
+    for account_id, (ads_meta, ads_insights) in zip(by_account, results):
+        lead_types = await lead_definitions.lead_types_for_account(account_id)
+        ins_map = {row.get("ad_id"): row for row in ads_insights if row.get("ad_id")}
+        ads = [ad for ad in ads_meta if ad.get("adset_id") in grouped]
+        for ad, item in zip(ads, build_ad_items(ads, [ins_map.get(ad.get("id"), {}) for ad in ads], lead_types)):
+            grouped[ad["adset_id"]].append(item)
+    return grouped
+
+async def process_account_adsets(session: aiohttp.ClientSession, acc: dict, date_preset: str, start_date: Optional[str], end_date: Optional[str]) -> List[dict]:
+    """Fetch adsets and their insights for a single ad account and build dashboard rows."""
+    acc_name, acc_id = acc.get("name"), acc.get("account_id")
+    adsets = await get_all_adsets_from_account(session, acc_id)
+    if not adsets: return []
+
+    insights = await get_insights_for_adsets(session, acc_id, [a["id"] for a in adsets], date_preset, start_date, end_date)
+    insights_map = {row["adset_id"]: row for row in insights}
+
+    adsets = [adset for adset in adsets if adset["id"] in insights_map]
+    lead_types = await lead_definitions.lead_types_for_account(acc_id)
+    cols = as_lists(normalize_insights([insights_map[adset["id"]] for adset in adsets], lead_types))
+    avatar_url = resolve_avatar_url(acc_id, acc_name)
+    return [
+        {
+            "account_id": acc_id, "account_name": acc_name, "avatarUrl": avatar_url,
+            "adset_id": adset["id"], "adset_name": adset.get("name"),
+            "campaign_name": (adset.get("campaign") or {}).get("name"),
+            "status": adset.get("effective_status"),
+            "objective": (adset.get("campaign") or {}).get("objective", "N/A"),
+            "spend": cols["spend"][i], "leads": cols["leads"][i], "cpl": cols["cpl"][i],
+            "cpm": cols["cpm"][i], "ctr_all": cols["ctr"][i],
+            "link_clicks": cols["link_clicks"][i],
+            "impressions": cols["impressions"][i],
+            "frequency": cols["frequency"][i],
+        }
+        for i, adset in enumerate(adsets)
+    ]
+
+async def fetch_and_process_all_adsets(session: aiohttp.ClientSession, date_preset: str, start_date: Optional[str], end_date: Optional[str], errors: Optional[List[dict]] = None) -> List[dict]:
+    """
+    Orchestrator function to get all adset data from all accounts.
+    Accounts are processed concurrently (at most ACCOUNT_FETCH_CONCURRENCY at a time) and
+    merged in the order returned by Meta. A failing account does not fail the whole
+    response: it is logged and, if `errors` is given, appended to it.
+    """
+    accounts = [acc for acc in await get_ad_accounts(session) if acc.get("account_id")]
+    if not accounts: return []
+
+    semaphore = asyncio.Semaphore(max(1, ACCOUNT_FETCH_CONCURRENCY))
+
+    async def run(acc: dict) -> List[dict]:
+        async with semaphore:
+            return await process_account_adsets(session, acc, date_preset, start_date, end_date)
+
+    results = await asyncio.gather(*(run(acc) for acc in accounts), return_exceptions=True)
+
+    all_data = []
+    for acc, result in zip(accounts, results):
+        if isinstance(result, BaseException):
+            logging.error(f"Failed to fetch adsets for account {acc.get('account_id')}: {result}")
+            if errors is not None:
+                errors.append({"account_id": acc.get("account_id"), "account_name": acc.get("name"), "error": str(result)})
+            continue
+        all_data.extend(result)
+    return all_data
+
+async def iter_adsets_by_account(session: aiohttp.ClientSession, date_preset: str, start_date: Optional[str], end_date: Optional[str]) -> AsyncIterator[Tuple[dict, List[dict], Optional[BaseException]]]:
+    """
+    Yield (account, rows, error) for each ad account as soon as it is processed (completion order),
+    with the same concurrency limit as fetch_and_process_all_adsets. Results go through a queue,
+    so nothing keeps a reference to rows that were already consumed.
+    """
+    accounts = [acc for acc in await get_ad_accounts(session) if acc.get("account_id")]
+    semaphore = asyncio.Semaphore(max(1, ACCOUNT_FETCH_CONCURRENCY))
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def run(acc: dict) -> None:
+        async with semaphore:
+            try:
+                result = (acc, await process_account_adsets(session, acc, date_preset, start_date, end_date), None)
+            except Exception as e:
+                logging.error(f"Failed to fetch adsets for account {acc.get('account_id')}: {e}")
+                result = (acc, [], e)
+        queue.put_nowait(result)
+
+    tasks = [asyncio.create_task(run(acc)) for acc in accounts]
+    try:
+        for _ in tasks:
+            yield await queue.get()
+    finally:
+        # клиент отключился — не продолжаем ходить в Graph API
+        for task in tasks:
+            task.cancel()
+
+adsets_cache = ResponseCache(max_bytes=ADSETS_CACHE_MAX_BYTES)
+
+def adsets_cache_ttl(date_preset: str, start_date: Optional[str], end_date: Optional[str]) -> int:
+    """Short TTL for ranges that still change (today), long TTL for closed ranges."""
+    if start_date and end_date:
+        if end_date < datetime.now().strftime("%Y-%m-%d"):
+            return ADSETS_CACHE_CLOSED_RANGE_TTL
+        return ADSETS_CACHE_DEFAULT_TTL
+    return ADSETS_CACHE_TTLS.get(date_preset, ADSETS_CACHE_DEFAULT_TTL)
+
+def adsets_cache_ttls(date_preset: str, start_date: Optional[str], end_date: Optional[str], errors: List[dict]) -> Tuple[int, int]:
+    """
+    (ttl, stale_ttl) for a result of the range. With failed accounts it is kept only briefly and never
+    served stale, so one throttled account doesn't vanish from the dashboard for the range's full TTL.
+    """
+    if errors:
+        return ADSETS_CACHE_PARTIAL_TTL, 0
+    return adsets_cache_ttl(date_preset, start_date, end_date), ADSETS_CACHE_STALE_TTL
+
+async def get_cached_adsets(session: aiohttp.ClientSession, date_preset: str, start_date: Optional[str], end_date: Optional[str]) -> Optional[Tuple[List[dict], List[dict], str, int]]:
+    """
+    (rows, account errors, "HIT" | "STALE", age) if adsets_cache has the range, else None without loading.
+    A stale entry starts the same background refresh as fetch_all_adsets_cached.
+    """
+    if adsets_cache.get((date_preset, start_date, end_date)) is None:
+        return None
+    return await fetch_all_adsets_cached(session, date_preset, start_date, end_date)
+
+def store_adsets(date_preset: str, start_date: Optional[str], end_date: Optional[str], rows: List[dict], errors: List[dict]) -> None:
+    """Cache rows assembled outside fetch_all_adsets_cached (the NDJSON stream) under the same key and TTLs."""
+    ttl, stale_ttl = adsets_cache_ttls(date_preset, start_date, end_date, errors)
+    adsets_cache.set((date_preset, start_date, end_date), (rows, errors), ttl=ttl, stale_ttl=stale_ttl)
+
+async def fetch_all_adsets_cached(session: aiohttp.ClientSession, date_preset: str, start_date: Optional[str], end_date: Optional[str]) -> Tuple[List[dict], List[dict], str, int]:
+    """
+    fetch_and_process_all_adsets behind adsets_cache (stale-while-revalidate).
+    Returns (rows, account errors, cache status, age in seconds).
+    """
+    async def load():
+        errors: List[dict] = []
+        rows = await fetch_and_process_all_adsets(session, date_preset, start_date, end_date, errors=errors)
+        return rows, errors
+
+    (rows, errors), status, age = await adsets_cache.get_or_load(
+        (date_preset, start_date, end_date), load,
+        ttl=adsets_cache_ttl(date_preset, start_date, end_date), stale_ttl=ADSETS_CACHE_STALE_TTL,
+        ttl_for=lambda value: adsets_cache_ttls(date_preset, start_date, end_date, value[1]),
+    )
+    return rows, errors, status, age
+
+async def update_entity_status(session: aiohttp.ClientSession, entity_id: str, new_status: str) -> dict:
     """Updates the status of an ad or adset."""
-    url = f"https://graph.facebook.com/{API_VERSION}/{entity_id}"
+    url = f"{GRAPH_API_URL}/{entity_id}"
     data = {"status": new_status}
-    async with aiohttp.ClientSession() as session:
-        return await fb_request(session, "post", url, data=data)
+    return await fb_request(session, "post", url, data=data)
 
-async def update_adset_budget_dates(adset_id: str, daily_budget: Optional[float] = None, lifetime_budget: Optional[float] = None, end_time: Optional[str] = None, start_time: Optional[str] = None) -> Dict:
+async def update_adset_budget_dates(session: aiohttp.ClientSession, adset_id: str, daily_budget: Optional[float] = None, lifetime_budget: Optional[float] = None, end_time: Optional[str] = None, start_time: Optional[str] = None) -> Dict:
     """
     Update adset budget (daily or lifetime) and optionally dates via Facebook Graph API.
     Budgets must be provided in the smallest currency unit (e.g., cents).
@@ -150,8 +656,7 @@ async def update_adset_budget_dates(adset_id: str, daily_budget: Optional[float]
     """
     if not META_TOKEN:
         raise HTTPException(status_code=500, detail="Token not configured")
-    import aiohttp
-    url = f"https://graph.facebook.com/{API_VERSION}/{adset_id}"
+    url = f"{GRAPH_API_URL}/{adset_id}"
     data: Dict[str, str] = {}
     # Meta expects integers in minor units
     if daily_budget is not None:
@@ -165,12 +670,11 @@ async def update_adset_budget_dates(adset_id: str, daily_budget: Optional[float]
     if not data:
         return {"updated": False, "message": "No fields to update"}
     params = {"access_token": META_TOKEN}
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, params=params, data=data) as response:
-            resp_json = await response.json()
-            if response.status != 200:
-                raise HTTPException(status_code=response.status, detail=resp_json)
-            return {"updated": True, "response": resp_json}
+    async with session.post(url, params=params, data=data) as response:
+        resp_json = await response.json()
+        if response.status != 200:
+            raise HTTPException(status_code=response.status, detail=resp_json)
+        return {"updated": True, "response": resp_json}
 
 async def _get_entity_activity(session: aiohttp.ClientSession, entity_id: str, after: Optional[str], limit: int) -> Dict:
     if not META_TOKEN:
@@ -186,7 +690,7 @@ async def _get_entity_activity(session: aiohttp.ClientSession, entity_id: str, a
     last_error: Optional[Exception] = None
     for edge in ("adactivity", "activities"):
         try:
-            url = f"https://graph.facebook.com/{API_VERSION}/{entity_id}/{edge}"
+            url = f"{GRAPH_API_URL}/{entity_id}/{edge}"
             data = await fb_request(session, "get", url, params=params)
             if data is not None:
                 break
@@ -268,7 +772,7 @@ async def get_adset_details(session: aiohttp.ClientSession, adset_id: str) -> Di
         "end_time",
         "updated_time"
     ])
-    url = f"https://graph.facebook.com/{API_VERSION}/{adset_id}"
+    url = f"{GRAPH_API_URL}/{adset_id}"
     params = {"fields": fields}
     data = await fb_request(session, "get", url, params=params)
     return {
@@ -0,0 +1,190 @@
+# backend/services/graph_throttle.py
+
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from core.config import (
+    GRAPH_RATE_PER_ACCOUNT, GRAPH_BURST_PER_ACCOUNT, GRAPH_USAGE_SLOWDOWN_PCT, GRAPH_USAGE_PAUSE_PCT,
+    GRAPH_BACKOFF_BASE, GRAPH_BACKOFF_MAX,
+)
+
+# Meta error codes that mean "throttled, try again later"
+# https://developers.facebook.com/docs/graph-api/overview/rate-limiting
+THROTTLE_ERROR_CODES = {4, 17, 32, 613, 80000, 80001, 80002, 80003, 80004, 80005, 80006, 80008, 80009, 80014}
+
+_ACCOUNT_RE = re.compile(r"/act_(\d+)(?:/|$|\?)")
+_OBJECT_RE = re.compile(r"^(?:https?://[^/]+)?/*(?:v\d+\.\d+/)?(\d+)(?:/|$|\?)")
+
+# object ids (adsets, ads, report runs) whose owners we remember from their responses' usage headers
+MAX_KNOWN_OWNERS = 50000
+
+def account_id(url: str) -> Optional[str]:
+    """Ad account id named by a Graph URL (act_<id>/...), without the act_ prefix."""
+    match = _ACCOUNT_RE.search(url)
+    return match.group(1) if match else None
+
+def usage_key(url: str) -> str:
+    """Label for logs: the ad account a URL names, or "app"."""
+    account = account_id(url)
+    return f"act_{account}" if account else "app"
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(GRAPH_BACKOFF_MAX, GRAPH_BACKOFF_BASE * (2 ** attempt)))
+
+class UsageBucket:
+    """
+    Token bucket for one usage owner (the app, an ad account or a business). Only used once
+    Meta-reported usage passes GRAPH_USAGE_SLOWDOWN_PCT; its rate shrinks as usage approaches 100%.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.usage_pct = 0.0
+        self.paused_until = 0.0
+        self.throttled = 0
+
+    def effective_rate(self, usage_pct: float) -> float:
+        if usage_pct <= GRAPH_USAGE_SLOWDOWN_PCT:
+            return self.rate
+        headroom = (GRAPH_USAGE_PAUSE_PCT - usage_pct) / max(1.0, GRAPH_USAGE_PAUSE_PCT - GRAPH_USAGE_SLOWDOWN_PCT)
+        return self.rate * max(0.05, headroom)
+
+    def reserve(self, usage_pct: float) -> float:
+        """Take one token; return how long the caller has to wait before dispatching."""
+        now = time.monotonic()
+        rate = self.effective_rate(usage_pct)
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / rate
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+class GraphThrottle:
+    """
+    Dispatch scheduler driven by Meta's usage headers (X-App-Usage, X-Ad-Account-Usage,
+    X-Business-Use-Case-Usage). Usage is kept per owner named in the headers: "app", and the
+    ad account / business ids of the BUC header (an act_<id> URL's X-Ad-Account-Usage goes to <id>).
+    Calls pass straight through until an owner they belong to reports usage above
+    GRAPH_USAGE_SLOWDOWN_PCT; then they are paced, and paused at GRAPH_USAGE_PAUSE_PCT or on throttling errors.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[str, UsageBucket] = {}
+        # object id -> owner ids reported by the BUC header of its responses (adset/ad URLs don't name the account)
+        self._owners: Dict[str, Tuple[str, ...]] = {}
+
+    def bucket(self, key: str) -> UsageBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = UsageBucket(GRAPH_RATE_PER_ACCOUNT, GRAPH_BURST_PER_ACCOUNT)
+        return bucket
+
+    def owner_keys(self, url: str) -> Tuple[str, ...]:
+        """Usage owners a call to `url` counts against, besides the app."""
+        account = account_id(url)
+        if account:
+            return (account,)
+        match = _OBJECT_RE.match(url)
+        return self._owners.get(match.group(1), ()) if match else ()
+
+    async def wait_paused(self, url: str) -> List[UsageBucket]:
+        """Sleep while the app or an owner of `url` is paused; returns those buckets."""
+        buckets = [self.bucket("app")] + [self.bucket(key) for key in self.owner_keys(url)]
+        while True:
+            pause = max(bucket.paused_until for bucket in buckets) - time.monotonic()
+            if pause <= 0:
+                return buckets
+            await asyncio.sleep(pause)
+
+    async def acquire(self, url: str) -> None:
+        """Wait until an HTTP request to `url` may be sent. Free below the slowdown threshold."""
+        buckets = await self.wait_paused(url)
+        busiest = max(buckets, key=lambda bucket: bucket.usage_pct)
+        if busiest.usage_pct <= GRAPH_USAGE_SLOWDOWN_PCT:
+            return
+        wait = busiest.reserve(busiest.usage_pct)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def throttled(self, url: str, delay: float) -> None:
+        """Meta rejected a call with a throttling error: pause its owners (the app if unknown) for `delay` seconds."""
+        for key in self.owner_keys(url) or ("app",):
+            bucket = self.bucket(key)
+            bucket.throttled += 1
+            bucket.pause(delay)
+
+    def record_headers(self, url: str, headers: Mapping[str, str]) -> None:
+        app_usage = _parse_header(headers.get("X-App-Usage"))
+        if isinstance(app_usage, dict):
+            self._update("app", _max_pct(app_usage), 0)
+
+        # the header doesn't say which account it is about: only trust it when the URL names one
+        account = account_id(url)
+        account_usage = _parse_header(headers.get("X-Ad-Account-Usage"))
+        if account and isinstance(account_usage, dict):
+            usage_pct = float(account_usage.get("acc_id_util_pct") or 0)
+            # reset_time_duration is always reported; it only matters once we are at the limit
+            reset = float(account_usage.get("reset_time_duration") or 0) if usage_pct >= GRAPH_USAGE_PAUSE_PCT else 0
+            self._update(account, usage_pct, reset)
+
+        buc_usage = _parse_header(headers.get("X-Business-Use-Case-Usage"))
+        if isinstance(buc_usage, dict) and buc_usage:
+            for owner_id, entries in buc_usage.items():
+                key = str(owner_id).removeprefix("act_")
+                entries = [entry for entry in entries or [] if isinstance(entry, dict)]
+                if entries:
+                    self._update(
+                        key, max(_max_pct(entry) for entry in entries),
+                        max(float(entry.get("estimated_time_to_regain_access") or 0) for entry in entries) * 60,
+                    )
+            match = _OBJECT_RE.match(url) if not account else None
+            if match:
+                if len(self._owners) >= MAX_KNOWN_OWNERS:
+                    self._owners.clear()
+                self._owners[match.group(1)] = tuple(str(owner_id).removeprefix("act_") for owner_id in buc_usage)
+
+    def usage(self) -> Dict[str, dict]:
+        now = time.monotonic()
+        return {
+            key: {
+                "usage_pct": round(bucket.usage_pct, 1),
+                "paused_for": round(max(0.0, bucket.paused_until - now), 1),
+                "throttled": bucket.throttled,
+            }
+            for key, bucket in self._buckets.items()
+        }
+
+    def _update(self, key: str, usage_pct: float, regain_seconds: float) -> None:
+        bucket = self.bucket(key)
+        bucket.usage_pct = usage_pct
+        if regain_seconds > 0:
+            bucket.pause(regain_seconds)
+        elif usage_pct >= GRAPH_USAGE_PAUSE_PCT:
+            # no reset hint from Meta: back off for a minute
+            bucket.pause(60)
+        if usage_pct >= GRAPH_USAGE_SLOWDOWN_PCT:
+            logging.warning(f"Graph API usage for {key} at {usage_pct:.0f}%")
+
+def _parse_header(value: Optional[str]):
+    if not value:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return None
+
+def _max_pct(usage: dict) -> float:
+    return max(float(usage.get(k) or 0) for k in ("call_count", "total_cputime", "total_time"))
+
+graph_throttle = GraphThrottle()
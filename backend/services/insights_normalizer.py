@@ -0,0 +1,65 @@
+# backend/services/insights_normalizer.py
+
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+import numpy as np
+
+from services.lead_definitions import compile_lead_types
+from utils.helpers import safe_float
+
+# Columnar parsing of Graph insights rows: one pass over the rows builds a float matrix,
+# derived metrics (CPL, link CTR) are computed on whole columns.
+
+RAW_FIELDS = ("spend", "impressions", "clicks", "inline_link_clicks", "cpm", "ctr", "frequency")
+INT_COLUMNS = ("impressions", "clicks", "link_clicks", "leads")
+
+def count_leads(actions: Optional[Iterable[dict]], lead_types: FrozenSet[str]) -> int:
+    return sum(
+        int(safe_float(a.get("value", 0)))
+        for a in (actions or [])
+        if a.get("action_type") in lead_types
+    )
+
+def normalize_insights(rows: List[dict], lead_types: Optional[FrozenSet[str]] = None) -> Dict[str, np.ndarray]:
+    """
+    Typed columns for a batch of raw insights rows (missing rows may be passed as {}):
+    spend, impressions, clicks, link_clicks, leads, cpm, ctr, frequency, cpl, ctr_link.
+    Leads are the actions in `lead_types` (the account's lead definition; default definition if None).
+    """
+    if lead_types is None:
+        lead_types = compile_lead_types()
+    raw = [
+        (
+            r.get("spend") or 0, r.get("impressions") or 0, r.get("clicks") or 0, r.get("inline_link_clicks") or 0,
+            r.get("cpm") or 0, r.get("ctr") or 0, r.get("frequency") or 0,
+            count_leads(r.get("actions"), lead_types),
+        )
+        for r in rows
+    ]
+    try:
+        matrix = np.array(raw, dtype=np.float64)
+    except (TypeError, ValueError):
+        # a non-numeric value somewhere: fall back to per-value parsing for this batch
+        matrix = np.array([[safe_float(v) for v in row] for row in raw], dtype=np.float64)
+    matrix = matrix.reshape(len(rows), len(RAW_FIELDS) + 1)
+
+    spend, impressions, clicks, link_clicks, cpm, ctr, frequency, leads = matrix.T
+    return {
+        "spend": spend,
+        "impressions": impressions,
+        "clicks": clicks,
+        "link_clicks": link_clicks,
+        "leads": leads,
+        "cpm": cpm,
+        "ctr": ctr,
+        "frequency": frequency,
+        "cpl": np.divide(spend, leads, out=np.zeros_like(spend), where=leads > 0),
+        "ctr_link": np.divide(link_clicks * 100.0, impressions, out=np.zeros_like(spend), where=impressions > 0),
+    }
+
+def as_lists(columns: Dict[str, np.ndarray]) -> Dict[str, list]:
+    """Columns as plain Python lists (ints for counters) so they serialize without numpy types."""
+    return {
+        name: (values.astype(np.int64) if name in INT_COLUMNS else values).tolist()
+        for name, values in columns.items()
+    }
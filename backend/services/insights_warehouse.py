@@ -0,0 +1,237 @@
+# backend/services/insights_warehouse.py
+
+import asyncio
+import json
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+import aiohttp
+from sqlalchemy import text
+
+from core.config import (
+    GRAPH_API_URL, META_TOKEN, ACCOUNT_FETCH_CONCURRENCY,
+    INSIGHTS_SYNC_ENABLED, INSIGHTS_SYNC_INTERVAL, INSIGHTS_MUTABLE_DAYS, INSIGHTS_WAREHOUSE_START_DATE,
+)
+from core.database import async_engine, engine
+from services import facebook_service
+
+# Local store of daily adset/ad insights. Days older than INSIGHTS_MUTABLE_DAYS (the attribution
+# window) no longer change, so each sync re-fetches only that window plus the new days.
+
+# pg_try_advisory_lock key: with several workers, one runs each sync pass and the others skip it
+SYNC_LOCK_KEY = 0x61645F7379  # "ad_sy"
+
+INSIGHT_FIELDS = "spend,impressions,clicks,inline_link_clicks,actions,cpm,ctr,frequency,date_start"
+
+UPSERT_SQL = text("""
+    INSERT INTO insights_daily (level, object_id, account_id, adset_id, date_start, spend, impressions, clicks,
+                                inline_link_clicks, cpm, ctr, frequency, actions, synced_at)
+    VALUES (:level, :object_id, :account_id, :adset_id, :date_start, :spend, :impressions, :clicks,
+            :inline_link_clicks, :cpm, :ctr, :frequency, :actions, :synced_at)
+    ON CONFLICT (level, object_id, date_start) DO UPDATE SET
+        spend = excluded.spend,
+        impressions = excluded.impressions,
+        clicks = excluded.clicks,
+        inline_link_clicks = excluded.inline_link_clicks,
+        cpm = excluded.cpm,
+        ctr = excluded.ctr,
+        frequency = excluded.frequency,
+        actions = excluded.actions,
+        synced_at = excluded.synced_at
+""")
+
+def _to_db_row(level: str, account_id: str, row: dict, synced_at: datetime) -> dict:
+    object_id = row.get("ad_id") if level == "ad" else row.get("adset_id")
+    return {
+        "level": level,
+        "object_id": object_id,
+        "account_id": account_id,
+        "adset_id": row.get("adset_id"),
+        "date_start": date.fromisoformat(row["date_start"]),
+        "spend": float(row.get("spend") or 0),
+        "impressions": int(float(row.get("impressions") or 0)),
+        "clicks": int(float(row.get("clicks") or 0)),
+        "inline_link_clicks": int(float(row.get("inline_link_clicks") or 0)),
+        "cpm": float(row.get("cpm") or 0),
+        "ctr": float(row.get("ctr") or 0),
+        "frequency": float(row.get("frequency") or 0),
+        "actions": json.dumps(row.get("actions") or []),
+        "synced_at": synced_at,
+    }
+
+def _from_db_row(row) -> dict:
+    """Back to the Graph insights row shape, so callers parse stored and live rows the same way."""
+    return {
+        "account_id": row["account_id"],
+        "adset_id": row["adset_id"],
+        "date_start": str(row["date_start"])[:10],
+        "spend": row["spend"],
+        "impressions": row["impressions"],
+        "clicks": row["clicks"],
+        "inline_link_clicks": row["inline_link_clicks"],
+        "cpm": row["cpm"],
+        "ctr": row["ctr"],
+        "frequency": row["frequency"],
+        "actions": json.loads(row["actions"] or "[]"),
+    }
+
+def _store_rows(account_id: Optional[str], rows_by_level: Dict[str, List[dict]], synced_until: Optional[date]) -> int:
+    synced_at = datetime.utcnow()
+    params = [
+        _to_db_row(level, account_id or row.get("account_id") or "", row, synced_at)
+        for level, rows in rows_by_level.items()
+        for row in rows
+        if row.get("date_start")
+    ]
+    with engine.begin() as conn:
+        if params:
+            conn.execute(UPSERT_SQL, params)
+        if account_id and synced_until:
+            conn.execute(
+                text("""
+                    INSERT INTO insights_sync_state (account_id, last_synced_date, synced_at)
+                    VALUES (:account_id, :last_synced_date, :synced_at)
+                    ON CONFLICT (account_id) DO UPDATE SET
+                        last_synced_date = excluded.last_synced_date,
+                        synced_at = excluded.synced_at
+                """),
+                {"account_id": account_id, "last_synced_date": synced_until, "synced_at": synced_at},
+            )
+    return len(params)
+
+def _last_synced_date(account_id: str) -> Optional[date]:
+    with engine.connect() as conn:
+        value = conn.execute(
+            text("SELECT last_synced_date FROM insights_sync_state WHERE account_id = :account_id"),
+            {"account_id": account_id},
+        ).scalar()
+    return date.fromisoformat(str(value)[:10]) if value else None
+
+def _load_adset_rows(adset_id: str) -> List[dict]:
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text("""
+                SELECT account_id, adset_id, date_start, spend, impressions, clicks, inline_link_clicks, cpm, ctr, frequency, actions
+                FROM insights_daily
+                WHERE adset_id = :adset_id AND level = 'adset'
+                ORDER BY date_start
+            """),
+            {"adset_id": adset_id},
+        ).mappings().all()
+    return [_from_db_row(row) for row in rows]
+
+def sync_window(last_synced: Optional[date], today: date) -> date:
+    """First day to (re)fetch: the attribution window before the last sync, or the warehouse start."""
+    if last_synced is None:
+        return date.fromisoformat(INSIGHTS_WAREHOUSE_START_DATE)
+    return min(last_synced, today) - timedelta(days=INSIGHTS_MUTABLE_DAYS)
+
+async def sync_account(session: aiohttp.ClientSession, account_id: str) -> int:
+    """Fetch the mutable window + new days of daily adset- and ad-level insights for one account."""
+    today = date.today()
+    since = sync_window(await asyncio.to_thread(_last_synced_date, account_id), today)
+    url = f"{GRAPH_API_URL}/act_{account_id}/insights"
+    base = {
+        "time_increment": 1,
+        "time_range": json.dumps({"since": since.isoformat(), "until": today.isoformat()}),
+        "limit": 500,
+    }
+    adset_rows, ad_rows = await asyncio.gather(
+        facebook_service.fetch_insights(session, url, {**base, "level": "adset", "fields": f"adset_id,{INSIGHT_FIELDS}"}),
+        facebook_service.fetch_insights(session, url, {**base, "level": "ad", "fields": f"ad_id,adset_id,{INSIGHT_FIELDS}"}),
+    )
+    return await asyncio.to_thread(_store_rows, account_id, {"adset": adset_rows, "ad": ad_rows}, today)
+
+async def sync_all_accounts(session: aiohttp.ClientSession) -> Dict[str, int]:
+    """One sync pass over every ad account; failures are logged per account."""
+    accounts = [acc["account_id"] for acc in await facebook_service.get_ad_accounts(session) if acc.get("account_id")]
+    semaphore = asyncio.Semaphore(max(1, ACCOUNT_FETCH_CONCURRENCY))
+
+    async def bounded(acc_id: str) -> int:
+        async with semaphore:
+            return await sync_account(session, acc_id)
+
+    results = await asyncio.gather(*(bounded(acc_id) for acc_id in accounts), return_exceptions=True)
+    stored = {}
+    for acc_id, result in zip(accounts, results):
+        if isinstance(result, BaseException):
+            logging.error(f"Insights sync failed for account {acc_id}: {result}")
+        else:
+            stored[acc_id] = result
+    return stored
+
+def _synced_recently() -> bool:
+    """A worker stored an account within the last 90% of the interval, i.e. this round's pass already ran."""
+    with engine.connect() as conn:
+        value = conn.execute(text("SELECT MAX(synced_at) FROM insights_sync_state")).scalar()
+    if value is None:
+        return False
+    last = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+    return datetime.utcnow() - last < timedelta(seconds=INSIGHTS_SYNC_INTERVAL * 0.9)
+
+async def sync_pass(session: aiohttp.ClientSession) -> Optional[Dict[str, int]]:
+    """
+    sync_all_accounts in one worker at a time: every worker runs the periodic loop, so a pass is
+    skipped (None) while another worker holds the lock or when one has just finished.
+    """
+    async with async_engine.connect() as conn:
+        leader_lock = conn.dialect.name == "postgresql"
+        if leader_lock:
+            # session-level lock, held across the pass without keeping a transaction open
+            locked = (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": SYNC_LOCK_KEY})).scalar()
+            await conn.commit()
+            if not locked:
+                return None
+        try:
+            if await asyncio.to_thread(_synced_recently):
+                return None
+            return await sync_all_accounts(session)
+        finally:
+            if leader_lock:
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SYNC_LOCK_KEY})
+                await conn.commit()
+
+async def run_periodic_sync(session: aiohttp.ClientSession) -> None:
+    """Background loop started from the app lifespan (tables come from core.migrations)."""
+    while True:
+        try:
+            stored = await sync_pass(session)
+            if stored is not None:
+                logging.info(f"Insights sync stored {sum(stored.values())} rows for {len(stored)} accounts")
+        except Exception as e:
+            logging.error(f"Insights sync failed: {e}", exc_info=True)
+        await asyncio.sleep(INSIGHTS_SYNC_INTERVAL)
+
+def start_background_sync(session: aiohttp.ClientSession) -> Optional[asyncio.Task]:
+    if not INSIGHTS_SYNC_ENABLED or not META_TOKEN:
+        return None
+    return asyncio.create_task(run_periodic_sync(session))
+
+async def get_adset_daily_insights(session: aiohttp.ClientSession, adset_id: str) -> Optional[List[dict]]:
+    """
+    Daily insights rows for an adset from the local store, with only the mutable tail
+    (last INSIGHTS_MUTABLE_DAYS days up to today) fetched live from Meta.
+    Returns None if the adset has not been synced yet, so callers fall back to a full live query.
+    """
+    try:
+        stored = await asyncio.to_thread(_load_adset_rows, adset_id)
+    except Exception as e:
+        logging.warning(f"Insights warehouse unavailable: {e}")
+        return None
+    if not stored:
+        return None
+
+    today = date.today()
+    since = sync_window(date.fromisoformat(stored[-1]["date_start"]), today)
+    url = f"{GRAPH_API_URL}/{adset_id}/insights"
+    params = {
+        "time_increment": 1,
+        "time_range": json.dumps({"since": since.isoformat(), "until": today.isoformat()}),
+        "fields": f"account_id,adset_id,{INSIGHT_FIELDS}",
+        "limit": 500,
+    }
+    delta = await facebook_service.fetch_insights(session, url, params)
+    merged = {row["date_start"]: row for row in stored}
+    merged.update({row["date_start"]: row for row in delta if row.get("date_start")})
+    return [merged[day] for day in sorted(merged)]
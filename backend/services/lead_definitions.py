@@ -0,0 +1,69 @@
+# backend/services/lead_definitions.py
+
+import asyncio
+import logging
+import time
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, Optional
+
+from sqlalchemy import text
+
+from core.config import LEAD_DEFINITION_PRESETS, DEFAULT_LEAD_DEFINITION, LEAD_DEFINITIONS_REFRESH
+from core.database import engine
+from utils.helpers import normalize_account_id
+
+# Per-account lead definitions (clients.lead_action_types), compiled once into a frozenset of
+# action types so counting leads is one set lookup per action.
+
+_account_definitions: Dict[str, str] = {}
+_loaded_at = 0.0
+_load_lock = asyncio.Lock()
+
+def parse_definition(value: Optional[Iterable[str]]) -> Optional[str]:
+    """List of preset names / action types from the API -> stored comma-separated value."""
+    if value is None:
+        return None
+    items = [str(item).strip() for item in value if str(item).strip()]
+    return ",".join(dict.fromkeys(items))
+
+@lru_cache(maxsize=256)
+def compile_lead_types(definition: Optional[str] = None) -> FrozenSet[str]:
+    lead_types = set()
+    for item in (definition or DEFAULT_LEAD_DEFINITION).split(","):
+        item = item.strip()
+        if item:
+            lead_types.update(LEAD_DEFINITION_PRESETS.get(item, [item]))
+    return frozenset(lead_types)
+
+def _load_definitions() -> Dict[str, str]:
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text("SELECT account_id, lead_action_types FROM clients WHERE lead_action_types IS NOT NULL")
+        ).mappings().all()
+    return {normalize_account_id(row["account_id"]): row["lead_action_types"] for row in rows if row["lead_action_types"]}
+
+async def refresh_definitions(force: bool = False) -> None:
+    global _account_definitions, _loaded_at
+    if not force and time.monotonic() - _loaded_at < LEAD_DEFINITIONS_REFRESH:
+        return
+    async with _load_lock:
+        if not force and time.monotonic() - _loaded_at < LEAD_DEFINITIONS_REFRESH:
+            return
+        try:
+            _account_definitions = await asyncio.to_thread(_load_definitions)
+        except Exception as e:
+            # без БД считаем лиды по умолчанию
+            logging.warning(f"Could not load lead definitions: {e}")
+        _loaded_at = time.monotonic()
+
+def set_account_definition(account_id: str, definition: Optional[str]) -> None:
+    """Apply a client's new definition right away (called after clients are created/updated)."""
+    key = normalize_account_id(account_id)
+    if definition:
+        _account_definitions[key] = definition
+    else:
+        _account_definitions.pop(key, None)
+
+async def lead_types_for_account(account_id: Optional[str]) -> FrozenSet[str]:
+    await refresh_definitions()
+    return compile_lead_types(_account_definitions.get(normalize_account_id(account_id)))
@@ -0,0 +1,99 @@
+# backend/services/overview_service.py
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import aiohttp
+from sqlalchemy import text
+
+from core.config import ADSETS_CACHE_STALE_TTL, OVERVIEW_CACHE_MAX_BYTES
+from core.database import engine
+from services import facebook_service
+from services.cache import ResponseCache
+from utils.helpers import normalize_account_id
+
+# Per-client budget overview: cached adset insights joined with the clients table.
+
+overview_cache = ResponseCache(max_bytes=OVERVIEW_CACHE_MAX_BYTES)
+
+def _load_clients() -> Dict[str, dict]:
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text("SELECT account_id, account_name, monthly_budget, start_date FROM clients")
+        ).mappings().all()
+    return {normalize_account_id(row["account_id"]): dict(row) for row in rows}
+
+async def _active_ads_counts(session: aiohttp.ClientSession, account_ids: List[str], errors: List[dict]) -> Dict[str, int]:
+    results = await asyncio.gather(
+        *(facebook_service.get_active_ads_count(session, acc_id) for acc_id in account_ids), return_exceptions=True
+    )
+    counts = {}
+    for acc_id, result in zip(account_ids, results):
+        if isinstance(result, BaseException):
+            logging.error(f"Failed to count active ads for account {acc_id}: {result}")
+            errors.append({"account_id": acc_id, "account_name": None, "error": str(result)})
+            result = 0
+        counts[acc_id] = result
+    return counts
+
+async def build_clients_overview(session: aiohttp.ClientSession, date_preset: str, start_date: Optional[str], end_date: Optional[str]) -> dict:
+    rows, account_errors, _, _ = await facebook_service.fetch_all_adsets_cached(session, date_preset, start_date, end_date)
+    errors = list(account_errors)
+    try:
+        clients_db = await asyncio.to_thread(_load_clients)
+    except Exception as e:
+        logging.warning(f"Could not load clients for overview: {e}")
+        clients_db = {}
+
+    # один проход по строкам adsets
+    by_account: Dict[str, dict] = {}
+    for row in rows:
+        acc_id = normalize_account_id(row.get("account_id"))
+        client = by_account.get(acc_id)
+        if client is None:
+            client = by_account[acc_id] = {
+                "account_id": acc_id, "account_name": row.get("account_name") or "Unknown",
+                "spent": 0.0, "impressions": 0, "leads": 0, "active_adsets": 0,
+            }
+        client["spent"] += row.get("spend") or 0.0
+        client["impressions"] += row.get("impressions") or 0
+        client["leads"] += row.get("leads") or 0
+        if row.get("status") == "ACTIVE":
+            client["active_adsets"] += 1
+
+    active_ads = await _active_ads_counts(
+        session, [acc_id for acc_id, c in by_account.items() if c["active_adsets"] > 0], errors
+    )
+
+    now = datetime.utcnow().isoformat() + "Z"
+    clients = []
+    for acc_id, client in by_account.items():
+        db_client = clients_db.get(acc_id)
+        if db_client:
+            monthly_budget, budget_source = float(db_client["monthly_budget"] or 0), "crm"
+        else:
+            # клиента нет в CRM — оценка, как раньше делал фронт
+            monthly_budget, budget_source = client["spent"] * 1.5, "estimate"
+        clients.append({
+            **client,
+            "spent": round(client["spent"], 2),
+            "cpl": round(client["spent"] / client["leads"], 2) if client["leads"] else 0.0,
+            "active_ads": active_ads.get(acc_id, 0),
+            "monthly_budget": round(monthly_budget, 2),
+            "remaining_budget": round(max(0.0, monthly_budget - client["spent"]), 2),
+            "budget_source": budget_source,
+            "last_updated": now,
+        })
+    clients.sort(key=lambda c: c["account_name"].lower())
+    return {"clients": clients, "errors": errors}
+
+async def get_clients_overview(session: aiohttp.ClientSession, date_preset: str, start_date: Optional[str] = None, end_date: Optional[str] = None):
+    """build_clients_overview behind overview_cache. Returns (payload, cache status, age)."""
+    return await overview_cache.get_or_load(
+        (date_preset, start_date, end_date),
+        lambda: build_clients_overview(session, date_preset, start_date, end_date),
+        ttl=facebook_service.adsets_cache_ttl(date_preset, start_date, end_date), stale_ttl=ADSETS_CACHE_STALE_TTL,
+        ttl_for=lambda payload: facebook_service.adsets_cache_ttls(date_preset, start_date, end_date, payload["errors"]),
+    )
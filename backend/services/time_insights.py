@@ -0,0 +1,110 @@
+# backend/services/time_insights.py
+
+from typing import FrozenSet, List, Optional
+
+import aiohttp
+import numpy as np
+
+from core.config import GRAPH_API_URL, ADSETS_CACHE_STALE_TTL, TIME_INSIGHTS_CACHE_MAX_BYTES
+from services import facebook_service, lead_definitions
+from services.cache import ResponseCache
+from services.insights_normalizer import normalize_insights
+
+HOURLY_BREAKDOWN = "hourly_stats_aggregated_by_advertiser_time_zone"
+
+time_insights_cache = ResponseCache(max_bytes=TIME_INSIGHTS_CACHE_MAX_BYTES)
+
+def _hour(bucket: str) -> int:
+    # "13:00:00 - 13:59:59" -> 13
+    try:
+        return int(str(bucket)[:2])
+    except ValueError:
+        return -1
+
+def aggregate_hourly(rows: List[dict], lead_types: Optional[FrozenSet[str]] = None) -> dict:
+    """
+    Aggregate daily x hourly insights rows into 24 hour buckets and per-day totals.
+    Rows are normalized into columns once, then np.bincount per metric.
+    """
+    hours = np.fromiter((_hour(r.get(HOURLY_BREAKDOWN, "")) for r in rows), dtype=np.int64, count=len(rows))
+    valid = (hours >= 0) & (hours < 24)
+    rows = [r for r, ok in zip(rows, valid) if ok]
+    hours = hours[valid]
+
+    days, day_index = np.unique(np.array([r.get("date_start", "") for r in rows], dtype=str), return_inverse=True)
+    columns = normalize_insights(rows, lead_types)
+    metrics = {k: columns[k] for k in ("spend", "leads", "impressions", "clicks")}
+    by_hour = {k: np.bincount(hours, weights=v, minlength=24) for k, v in metrics.items()}
+    by_day = {k: np.bincount(day_index, weights=v, minlength=len(days)) for k, v in metrics.items()}
+
+    days_count = max(1, len(days))
+    active = (by_hour["spend"] > 0) | (by_hour["impressions"] > 0) | (by_hour["leads"] > 0)
+    cpl = np.divide(by_hour["spend"], by_hour["leads"], out=np.zeros(24), where=by_hour["leads"] > 0)
+
+    hourly_averages = {}
+    for hour in np.flatnonzero(active).tolist():
+        hourly_averages[str(hour)] = {
+            "hour": hour,
+            "avg_spend": round(float(by_hour["spend"][hour]) / days_count, 2),
+            "avg_leads": round(float(by_hour["leads"][hour]) / days_count, 1),
+            "avg_impressions": round(float(by_hour["impressions"][hour]) / days_count, 0),
+            "total_spend": round(float(by_hour["spend"][hour]), 2),
+            "total_leads": round(float(by_hour["leads"][hour]), 0),
+            "total_impressions": round(float(by_hour["impressions"][hour]), 0),
+            "total_clicks": round(float(by_hour["clicks"][hour]), 0),
+            "cpl": round(float(cpl[hour]), 2),
+        }
+
+    daily_data = [
+        {
+            "date_start": day,
+            "spend": round(spend, 2),
+            "leads": int(leads),
+            "impressions": int(impressions),
+            "clicks": int(clicks),
+        }
+        for day, spend, leads, impressions, clicks in zip(
+            days.tolist(), by_day["spend"].tolist(), by_day["leads"].tolist(),
+            by_day["impressions"].tolist(), by_day["clicks"].tolist(),
+        )
+    ]
+
+    # ties broken by hour so the ranking is stable between calls
+    sorted_hours = sorted(hourly_averages.values(), key=lambda x: (-x["total_leads"], x["hour"]))
+    return {
+        "hourly_averages": hourly_averages,
+        "daily_data": daily_data,
+        "best_hours": sorted_hours[:5],
+        "worst_hours": sorted_hours[-3:] if len(sorted_hours) >= 3 else [],
+        "total_days": len(daily_data),
+        "date_range": {
+            "start": daily_data[0]["date_start"] if daily_data else None,
+            "end": daily_data[-1]["date_start"] if daily_data else None,
+        },
+    }
+
+async def fetch_hourly_rows(session: aiohttp.ClientSession, adset_id: str, date_preset: str, start_date: Optional[str], end_date: Optional[str]) -> List[dict]:
+    url = f"{GRAPH_API_URL}/{adset_id}/insights"
+    params = {
+        "time_increment": 1,
+        "breakdowns": HOURLY_BREAKDOWN,
+        "fields": "account_id,spend,impressions,clicks,actions,date_start",
+        "limit": 500,
+    }
+    if start_date and end_date:
+        params["time_range"] = f'{{"since":"{start_date}","until":"{end_date}"}}'
+    else:
+        params["date_preset"] = date_preset
+    return await facebook_service.fetch_insights(session, url, params)
+
+async def get_time_insights(session: aiohttp.ClientSession, adset_id: str, date_preset: str = "maximum", start_date: Optional[str] = None, end_date: Optional[str] = None):
+    """Hourly profile of an adset, cached per (adset, range). Returns (payload, cache status, age)."""
+    async def load():
+        rows = await fetch_hourly_rows(session, adset_id, date_preset, start_date, end_date)
+        lead_types = await lead_definitions.lead_types_for_account(rows[0].get("account_id")) if rows else None
+        return aggregate_hourly(rows, lead_types)
+
+    return await time_insights_cache.get_or_load(
+        (adset_id, date_preset, start_date, end_date), load,
+        ttl=facebook_service.adsets_cache_ttl(date_preset, start_date, end_date), stale_ttl=ADSETS_CACHE_STALE_TTL,
+    )
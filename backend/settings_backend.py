@@ -7,9 +7,11 @@ from dotenv import load_dotenv
 from fastapi import FastAPI, Body, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Dict, List
-from sqlalchemy import create_engine, Column, Integer, String
+from sqlalchemy import Column, Integer, String
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.orm import Session
+
+from core.database import get_db  # общий пул соединений приложения
 
 # --- Конфигурация ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -24,8 +26,6 @@ app.add_middleware(CORSMiddleware, allow_origins=origins, allow_credentials=True
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL is not set. Please connect a database service.")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 class AvatarSetting(Base):
@@ -34,14 +34,7 @@ class AvatarSetting(Base):
     account_id = Column(String, unique=True, index=True, nullable=False)
     image_url = Column(String, nullable=False)
 
-Base.metadata.create_all(bind=engine)
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# таблица avatar_settings создаётся миграцией: python manage.py migrate
 
 # --- Эндпоинты для Настроек Аватарок ---
 @app.get("/api/settings/avatars")
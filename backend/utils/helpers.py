@@ -9,6 +9,11 @@ def safe_float(value):
     except (ValueError, TypeError):
         return 0.0
 
+def normalize_account_id(account_id: Optional[str]) -> str:
+    """Ad account id without the "act_" prefix."""
+    account_id = str(account_id or "")
+    return account_id[4:] if account_id.startswith("act_") else account_id
+
 def resolve_avatar_url(account_id: str, account_name: Optional[str]) -> str:
     act_key = f"act_{account_id}" if account_id else None
     if account_id and CLIENT_AVATARS.get(account_id):
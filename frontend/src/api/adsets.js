@@ -17,6 +17,46 @@ export async function fetchAdsets(datePreset) {
   return handleResponse(response);
 }
 
+// NDJSON-режим: строки приходят по мере готовности аккаунтов, последняя запись — trailer
+export async function streamAdsets(datePreset, onRows) {
+  const response = await fetch(`${API_BASE_URL}/api/adsets?date_preset=${datePreset}&stream=ndjson`);
+  if (!response.ok) {
+    await handleResponse(response);
+  }
+  let trailer = null;
+
+  const flush = (text) => {
+    const rows = [];
+    for (const line of text.split("\n")) {
+      if (!line.trim()) continue;
+      const record = JSON.parse(line);
+      if (record.type === "trailer") trailer = record;
+      else rows.push(record);
+    }
+    if (rows.length) onRows(rows);
+  };
+
+  if (!response.body) {
+    flush(await response.text());
+    return trailer;
+  }
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lastNewline = buffer.lastIndexOf("\n");
+    if (lastNewline >= 0) {
+      flush(buffer.slice(0, lastNewline));
+      buffer = buffer.slice(lastNewline + 1);
+    }
+  }
+  flush(buffer + decoder.decode());
+  return trailer;
+}
+
 export async function fetchAdsetDetails(adsetId) {
   const response = await fetch(`${API_BASE_URL}/api/adsets/${encodeURIComponent(adsetId)}`);
   if (!response.ok) {
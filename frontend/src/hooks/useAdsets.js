@@ -25,9 +25,19 @@ export function useAdsets() {
     setError(null);
     try {
       console.log("Fetching adsets with datePreset:", datePreset);
-      const data = await api.fetchAdsets(datePreset);
-      console.log("Fetched adsets:", data?.length || 0, "items");
-      setAllAdsets(data || []);
+      // keep the current rows on screen until the first chunk of the new response replaces them
+      let received = 0;
+      const trailer = await api.streamAdsets(datePreset, (rows) => {
+        const first = received === 0;
+        received += rows.length;
+        setAllAdsets((prev) => (first ? rows : prev.concat(rows)));
+        setLoading(false);
+      });
+      if (received === 0) setAllAdsets([]);
+      console.log("Fetched adsets:", received, "items");
+      if (trailer?.errors?.length) {
+        console.warn("Accounts failed to load:", trailer.errors);
+      }
       setLastUpdated(new Date());
     } catch (e) {
       console.error("Error fetching adsets:", e);
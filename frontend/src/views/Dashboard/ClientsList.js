@@ -55,6 +55,7 @@ function ClientsList() {
     monthly_budget: "",
     start_date: "",
     monthly_payment_azn: "",
+    lead_action_types: "",
   });
   const paymentsModal = useDisclosure();
   const [paymentsClient, setPaymentsClient] = useState(null);
@@ -137,6 +138,7 @@ function ClientsList() {
       monthly_budget: "",
       start_date: "",
       monthly_payment_azn: "",
+      lead_action_types: "",
     });
     onOpen();
   };
@@ -150,6 +152,7 @@ function ClientsList() {
       monthly_budget: client.monthly_budget.toString(),
       start_date: client.start_date,
       monthly_payment_azn: client.monthly_payment_azn.toString(),
+      lead_action_types: (client.lead_action_types || []).join(", "),
     });
     onOpen();
   };
@@ -303,6 +306,10 @@ function ClientsList() {
         monthly_budget: parseFloat(formData.monthly_budget) || 0,
         start_date: formData.start_date,
         monthly_payment_azn: parseFloat(formData.monthly_payment_azn) || 0,
+        lead_action_types: formData.lead_action_types
+          .split(",")
+          .map((t) => t.trim())
+          .filter(Boolean),
       };
 
       let response;
@@ -639,6 +646,17 @@ function ClientsList() {
                 placeholder="0.00"
               />
             </FormControl>
+
+            <FormControl mb={4}>
+              <FormLabel>Что считать лидом</FormLabel>
+              <Input
+                value={formData.lead_action_types}
+                onChange={(e) =>
+                  setFormData({ ...formData, lead_action_types: e.target.value })
+                }
+                placeholder="messaging, lead_forms, pixel или action_type через запятую"
+              />
+            </FormControl>
           </ModalBody>
 
           <ModalFooter>
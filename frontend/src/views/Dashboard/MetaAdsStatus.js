@@ -395,142 +395,13 @@ function MetaAdsStatus() {
   const fetchClientsData = useCallback(async () => {
     setLoading(true);
     try {
-      // Формируем URL для запроса
-      let apiUrl = `${API_BASE}/api/adsets?date_preset=${datePresetMap[datePreset] || "today"}`;
-      
-      // Для "maximum" добавляем дату начала (июнь 2025)
-      if (datePreset === "maximum") {
-        apiUrl += "&start_date=2025-06-01";
-      }
-      
-      // Получаем данные по adsets
+      // Сводка по клиентам считается на сервере (spend/leads/CPL/активные adsets и ads/остаток бюджета)
+      const apiUrl = `${API_BASE}/api/overview/clients?date_preset=${datePresetMap[datePreset] || "today"}`;
       const response = await fetch(apiUrl);
       if (!response.ok) throw new Error("Failed to fetch data");
-      const adsetsData = await response.json();
-
-      // Группируем по клиентам (account_name)
-      const clientsMap = {};
-      
-      adsetsData.forEach((adset) => {
-        const accountName = adset.account_name || "Unknown";
-        const accountId = adset.account_id || "";
-
-        if (!clientsMap[accountName]) {
-          clientsMap[accountName] = {
-            account_name: accountName,
-            account_id: accountId,
-            monthly_budget: 0, // Будет из настроек клиентов
-            spent: 0,
-            active_adsets: 0,
-            active_ads: 0,
-            impressions: 0,
-            leads: 0,
-            cpl: 0,
-            last_updated: adset.last_updated || new Date().toISOString(),
-          };
-        }
-
-        const client = clientsMap[accountName];
-        
-        // Подсчитываем метрики
-        if (adset.status === "ACTIVE") {
-          client.active_adsets += 1;
-        }
-        client.spent += adset.spend || 0;
-        client.impressions += adset.impressions || 0;
-        client.leads += adset.leads || 0;
-        
-        // Обновляем дату последнего обновления (берем самую свежую)
-        if (adset.last_updated && adset.last_updated > client.last_updated) {
-          client.last_updated = adset.last_updated;
-        }
-      });
-
-      // Вычисляем CPL для каждого клиента
-      Object.values(clientsMap).forEach((client) => {
-        client.cpl = client.leads > 0 ? client.spent / client.leads : 0;
-      });
-
-      // Получаем бюджеты клиентов из БД
-      try {
-        const budgetsResponse = await fetch(`${API_BASE}/api/clients`);
-        if (budgetsResponse.ok) {
-          const clientsFromDb = await budgetsResponse.json();
-          const budgetsMap = {};
-          clientsFromDb.forEach((client) => {
-            budgetsMap[client.account_id] = client;
-            // Также создаем маппинг по имени на случай если ID не совпадает
-            budgetsMap[client.account_name] = client;
-          });
-          
-          Object.values(clientsMap).forEach((client) => {
-            const dbClient = budgetsMap[client.account_id] || budgetsMap[client.account_name];
-            if (dbClient) {
-              client.monthly_budget = dbClient.monthly_budget || 0;
-              client.remaining_budget = Math.max(0, client.monthly_budget - client.spent);
-            } else {
-              // Если клиента нет в БД, используем оценку
-              client.monthly_budget = client.spent * 1.5;
-              client.remaining_budget = Math.max(0, client.monthly_budget - client.spent);
-            }
-          });
-        } else {
-          // Если API недоступен, используем оценку
-          Object.values(clientsMap).forEach((client) => {
-            client.monthly_budget = client.spent * 1.5;
-            client.remaining_budget = Math.max(0, client.monthly_budget - client.spent);
-          });
-        }
-      } catch (e) {
-        // Если API для бюджетов недоступен, используем оценку
-        Object.values(clientsMap).forEach((client) => {
-          client.monthly_budget = client.spent * 1.5;
-          client.remaining_budget = Math.max(0, client.monthly_budget - client.spent);
-        });
-      }
-
-      // Получаем количество активных объявлений для каждого клиента
-      await Promise.all(
-        Object.values(clientsMap).map(async (client) => {
-          try {
-            // Получаем объявления для каждого adset клиента
-            const adsetsForClient = adsetsData.filter(
-              (a) => (a.account_name || "Unknown") === client.account_name
-            );
-            let totalAds = 0;
-            
-            // Подсчитываем объявления из данных adsets (если есть поле ads_count)
-            // Или делаем запрос для каждого активного adset
-            for (const adset of adsetsForClient) {
-              if (adset.status === "ACTIVE" && adset.adset_id) {
-                try {
-                  const adsResponse = await fetch(
-                    `${API_BASE}/api/adsets/${adset.adset_id}/ads?date_preset=${datePresetMap[datePreset] || "today"}`
-                  );
-                  if (adsResponse.ok) {
-                    const ads = await adsResponse.json();
-                    const activeAds = Array.isArray(ads) 
-                      ? ads.filter(ad => ad.status === "ACTIVE").length 
-                      : 0;
-                    totalAds += activeAds;
-                  }
-                } catch (e) {
-                  // Если не удалось получить, используем оценку
-                  totalAds += 2; // Примерная оценка
-                }
-              }
-            }
-            
-            client.active_ads = totalAds || client.active_adsets * 2; // Fallback на оценку
-          } catch (e) {
-            // Если не удалось получить, используем оценку
-            client.active_ads = client.active_adsets * 2;
-          }
-        })
-      );
+      const overview = await response.json();
 
-      const finalClientsList = Object.values(clientsMap);
-      setRawClients(finalClientsList);
+      setRawClients(overview.clients || []);
       setLastUpdated(new Date());
     } catch (error) {
       toast({